@@ -1,11 +1,19 @@
 import streamlit as st
 import os
-import PyPDF2
 import pandas as pd
-from docx import Document
-import tempfile
-import requests
 import json
+import hashlib
+import threading
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from async_llm_client import async_session, run_async
+from llm_providers import LLMUnavailableError, complete_chat, complete_chat_async, resolve_targets
+from rate_limiter import PRIORITY_HIGH, PRIORITY_NORMAL
+from llm_cache import CACHE_DISABLED, TieredCache, make_cache_key
+from document_readers import iter_document, iter_pdf_pages, take_text
+from chunking import CHARS_PER_TOKEN, chunk_stream, estimate_tokens, format_digest, format_ranges, merge_findings, parse_findings
+from telemetry import show_llm_usage
 
 # Set page config
 st.set_page_config(
@@ -17,117 +25,250 @@ st.set_page_config(
 # Initialize session state
 if 'processed_content' not in st.session_state:
     st.session_state.processed_content = None
+if 'large_document' not in st.session_state:
+    st.session_state.large_document = None
 
-def read_pdf(file):
-    """Extract text from PDF file"""
-    try:
-        pdf_reader = PyPDF2.PdfReader(file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text
-    except Exception as e:
-        st.error(f"Error reading PDF: {str(e)}")
-        return None
+# Model used when no route in llm_providers names one for the task
+DEFAULT_MODEL = "gpt-3.5-turbo"
 
-def read_excel(file):
-    """Extract text from Excel file"""
-    try:
-        df = pd.read_excel(file)
-        return df.to_string()
-    except Exception as e:
-        st.error(f"Error reading Excel: {str(e)}")
-        return None
+# Maximum number of analysis prompts sent to the API at the same time
+ANALYSIS_MAX_WORKERS = int(os.getenv("ANALYSIS_MAX_WORKERS", "3"))
 
-def read_docx(file):
-    """Extract text from Word document"""
-    try:
-        doc = Document(file)
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text
-    except Exception as e:
-        st.error(f"Error reading Word document: {str(e)}")
-        return None
+# Documents above this many tokens are split and analyzed section by section
+CHUNK_TOKEN_BUDGET = int(os.getenv("CHUNK_TOKEN_BUDGET", "6000"))
+CHUNK_MAX_WORKERS = int(os.getenv("CHUNK_MAX_WORKERS", "4"))
+
+# Extracted text is kept for a day, up to 32 MB in memory and 500 MB on disk
+EXTRACT_CACHE_TTL = int(os.getenv("EXTRACT_CACHE_TTL", str(24 * 3600)))
+
+@st.cache_resource(show_spinner=False)
+def get_extracted_text_cache():
+    """Process-wide cache of extracted document text, keyed by upload content hash"""
+    return TieredCache(
+        "extracted_text",
+        ttl=EXTRACT_CACHE_TTL,
+        memory_items=64,
+        memory_bytes=32 * 1024 * 1024,
+        disk_bytes=500 * 1024 * 1024
+    )
+
+def show_pdf_stats(stats):
+    """Show page count, extraction mode and the slowest page of a PDF"""
+    st.caption(
+        f"📄 Extracted {stats['pages']} pages in {stats['elapsed']:.2f}s "
+        f"({stats['mode']}, {stats['workers']} worker{'s' if stats['workers'] != 1 else ''}); "
+        f"slowest page {stats['slowest_page']} took {stats['slowest_page_seconds']:.2f}s"
+    )
+
+def stream_document(file, pdf_stats=None):
+    """Yield the document lazily as pages, paragraph batches or row batches"""
+    file_extension = file.name.split('.')[-1].lower()
+    file.seek(0)
+    if file_extension == 'pdf':
+        return iter_pdf_pages(file, pdf_stats)
+    return iter_document(file, file_extension)
 
 def process_document(file):
-    """Process uploaded document and extract text"""
+    """Process uploaded document, returning (text, is_large)
+    
+    Only documents within CHUNK_TOKEN_BUDGET are read in full. For larger ones
+    the text read so far serves as the preview, and the analysis streams the
+    whole document from the upload again.
+    
+    Results are cached by a hash of the upload, so reruns and re-uploads of
+    the same file skip parsing.
+    """
     file_extension = file.name.split('.')[-1].lower()
+    cache_key = make_cache_key(
+        hashlib.sha256(file.getvalue()).hexdigest(), file_extension, CHUNK_TOKEN_BUDGET
+    )
+    cached = get_extracted_text_cache().get(cache_key)
+    if cached is not None:
+        entry = json.loads(cached)
+        return entry['text'], entry['is_large']
     
     try:
-        if file_extension == 'pdf':
-            return read_pdf(file)
-        elif file_extension in ['xlsx', 'xls']:
-            return read_excel(file)
-        elif file_extension == 'docx':
-            return read_docx(file)
-        else:
+        pdf_stats = {}
+        blocks = stream_document(file, pdf_stats)
+        if blocks is None:
             st.error("Unsupported file format. Please upload PDF, Excel, or Word documents.")
-            return None
+            return None, False
+        
+        text, exhausted = take_text(blocks, CHUNK_TOKEN_BUDGET * CHARS_PER_TOKEN)
+        blocks.close()
+        if 'elapsed' in pdf_stats:
+            show_pdf_stats(pdf_stats)
+        get_extracted_text_cache().set(cache_key, json.dumps({'text': text, 'is_large': not exhausted}))
+        return text, not exhausted
     except Exception as e:
         st.error(f"Error processing document: {str(e)}")
-        return None
+        return None, False
 
-def call_openai_api(prompt, max_tokens=1500):
-    """Call OpenAI API with error handling"""
+def get_api_key():
+    """Look up the OpenAI API key, prompting for it as a last resort"""
+    # Method 1: Streamlit secrets; without a secrets.toml, reading them raises
     try:
-        # Try multiple ways to get API key
-        api_key = None
-        
-        # Method 1: Streamlit secrets
-        if hasattr(st, 'secrets') and "OPENAI_API_KEY" in st.secrets:
-            api_key = st.secrets["OPENAI_API_KEY"]
-            st.success("✅ API key loaded from Streamlit secrets")
-        
-        # Method 2: Environment variable
-        elif os.getenv("OPENAI_API_KEY"):
-            api_key = os.getenv("OPENAI_API_KEY")
-            st.success("✅ API key loaded from environment")
-        
-        # Method 3: Manual input (fallback)
-        else:
-            st.error("❌ OpenAI API key not found in secrets or environment.")
-            api_key = st.text_input("Enter your OpenAI API key:", type="password")
-            if not api_key:
-                st.stop()
+        secret = st.secrets.get("OPENAI_API_KEY")
+    except FileNotFoundError:
+        secret = None
+    if secret:
+        st.success("✅ API key loaded from Streamlit secrets")
+        return secret
+    
+    # Method 2: Environment variable
+    if os.getenv("OPENAI_API_KEY"):
+        st.success("✅ API key loaded from environment")
+        return os.getenv("OPENAI_API_KEY")
+    
+    # Method 3: Manual input (fallback)
+    st.error("❌ OpenAI API key not found in secrets or environment.")
+    api_key = st.text_input("Enter your OpenAI API key:", type="password")
+    if not api_key:
+        st.stop()
+    return api_key
+
+def build_chat_request(prompt, max_tokens=1500):
+    """Chat-completions payload for an analysis prompt; the route fills in the model"""
+    return {
+        "model": DEFAULT_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": max_tokens,
+        "temperature": 0.7
+    }
+
+def call_openai_api(prompt, max_tokens=1500, api_key=None, use_cache=None, priority=None, task=None):
+    """Call the routed LLM with error handling"""
+    if use_cache is None:
+        use_cache = not (CACHE_DISABLED or st.session_state.get('bypass_cache', False))
+    try:
+        # Callers running on worker threads resolve the key up front
+        if api_key is None:
+            api_key = get_api_key()
         
         if not api_key or not api_key.startswith('sk-'):
             st.error("❌ Invalid API key format. Should start with 'sk-'")
             return None
         
         # Make API call
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": "gpt-3.5-turbo",
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": max_tokens,
-            "temperature": 0.7
-        }
-        
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers=headers,
-            json=data,
-            timeout=60
-        )
+        data = build_chat_request(prompt, max_tokens)
+        return complete_chat(api_key, data, resolve_targets(task, DEFAULT_MODEL), use_cache=use_cache, priority=priority,
+                             task=task)
+    
+    except LLMUnavailableError as e:
+        st.error(f"API Error: {str(e)}")
+        return None
+    except Exception as e:
+        st.error(f"Error calling OpenAI API: {str(e)}")
+        return None
+
+async def call_openai_api_async(prompt, max_tokens=1500, api_key=None, use_cache=None, priority=None, task=None):
+    """Async call_openai_api with the same routing, cache, retries and rate limit; await it inside run_async()"""
+    if use_cache is None:
+        use_cache = not (CACHE_DISABLED or st.session_state.get('bypass_cache', False))
+    try:
+        if api_key is None:
+            api_key = get_api_key()
         
-        if response.status_code == 200:
-            return response.json()["choices"][0]["message"]["content"]
-        else:
-            st.error(f"API Error: {response.status_code} - {response.text}")
+        if not api_key or not api_key.startswith('sk-'):
+            st.error("❌ Invalid API key format. Should start with 'sk-'")
             return None
-            
+        
+        data = build_chat_request(prompt, max_tokens)
+        return await complete_chat_async(api_key, data, resolve_targets(task, DEFAULT_MODEL),
+                                         use_cache=use_cache, priority=priority, task=task)
+    
+    except LLMUnavailableError as e:
+        st.error(f"API Error: {str(e)}")
+        return None
     except Exception as e:
         st.error(f"Error calling OpenAI API: {str(e)}")
         return None
 
-def analyze_requirements(content):
-    """Analyze requirements and generate comprehensive results"""
+def make_api_worker(api_key, priority=PRIORITY_HIGH, task=None):
+    """Build a function that calls the API from a pool thread within this script run"""
+    ctx = get_script_run_ctx()
+    
+    def worker(prompt):
+        # Let st.error/st.success inside the API call reach this session
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return call_openai_api(prompt, api_key=api_key, priority=priority, task=task)
+    
+    return worker
+
+def condense_large_document(blocks, max_tokens=CHUNK_TOKEN_BUDGET, max_workers=CHUNK_MAX_WORKERS, worker=None, depth=0):
+    """Map-reduce a stream of document blocks that exceeds the token budget into a requirements digest"""
+    if worker is None:
+        try:
+            # Section extraction yields to the interactive analysis prompts
+            worker = make_api_worker(get_api_key(), priority=PRIORITY_NORMAL, task="condense_document")
+        except Exception as e:
+            st.error(f"Error calling OpenAI API: {str(e)}")
+            return None
+    
+    progress = st.empty()
+    findings = {}
+    failed = []
+    
+    def collect(future, index):
+        try:
+            response = future.result()
+        except Exception as e:
+            response = None
+            st.error(f"Error analyzing section {index}: {str(e)}")
+        # The worker reports its own errors and returns None
+        if response:
+            findings[index] = parse_findings(response)
+        else:
+            failed.append(index)
+        progress.info(f"📚 Large document: {len(findings)} sections analyzed, up to {max_workers} at a time...")
+    
+    # Map: extract findings from each section as soon as the chunker produces
+    # it, with a bounded number of sections in flight
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        for index, chunk in enumerate(chunk_stream(blocks, max_tokens), start=1):
+            extract_prompt = f"""
+    As an expert Requirements Analyst, extract the requirements from section {index} of a larger requirements document.
+
+    Respond with JSON only, using exactly these keys, each holding a list of short, self-contained strings:
+    "functional", "non_functional", "ambiguities", "test_cases"
+
+    Document Section:
+    {chunk}
+    """
+            pending[executor.submit(worker, extract_prompt)] = index
+            if len(pending) >= max_workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future, pending.pop(future))
+        for future in as_completed(pending):
+            collect(future, pending[future])
+    
+    # Reduce: merge and de-duplicate findings across sections in document order
+    digest = format_digest(merge_findings(findings[index] for index in sorted(findings)))
+    if failed and findings:
+        sections = len(findings) + len(failed)
+        st.warning(f"⚠️ {len(failed)} of {sections} document sections could not be analyzed "
+                   f"(sections {format_ranges(failed)}); the results below leave them out.")
+        # Keep the gap visible to the analysis prompts that read the digest
+        digest += (f"\n\nNote: sections {format_ranges(failed)} of {sections} could not be analyzed "
+                   "and are missing from this digest.")
+    if digest and estimate_tokens(digest) > max_tokens and depth < 2:
+        return condense_large_document([digest], max_tokens, max_workers, worker, depth + 1)
+    return digest
+
+def analyze_requirements(content, concurrent=True, source=None):
+    """Analyze requirements and generate comprehensive results
+    
+    A `source` upload is streamed through the map-reduce pipeline instead of
+    using `content`, which then only holds its beginning.
+    """
+    
+    if source is not None or estimate_tokens(content) > CHUNK_TOKEN_BUDGET:
+        content = condense_large_document(stream_document(source) if source is not None else [content])
+        if not content:
+            st.error("❌ Could not extract requirements from the document sections.")
+            return {'analysis': None, 'test_cases': None, 'behavioral_tests': None}
     
     # Requirements Analysis
     analysis_prompt = f"""
@@ -177,22 +318,62 @@ def analyze_requirements(content):
     Create test scenarios that explore different decision paths and their outcomes.
     """
     
+    tasks = [
+        ('analysis', analysis_prompt, "🔍 Analyzing requirements..."),
+        ('test_cases', test_cases_prompt, "🧪 Generating test cases..."),
+        ('behavioral_tests', behavioral_prompt, "🎯 Creating behavioral test scenarios..."),
+    ]
+    
+    if concurrent:
+        return run_prompts_concurrently(tasks)
+    
     results = {}
+    for key, prompt, label in tasks:
+        with st.spinner(label):
+            results[key] = call_openai_api(prompt, task=key)
     
-    # Get Requirements Analysis
-    with st.spinner("🔍 Analyzing requirements..."):
-        results['analysis'] = call_openai_api(analysis_prompt)
+    return results
+
+def run_prompts_concurrently(tasks, max_workers=ANALYSIS_MAX_WORKERS):
+    """Send (key, prompt, label) tasks to the API at once and gather the results by key"""
+    results = {key: None for key, _, _ in tasks}
     
-    # Get Test Cases
-    with st.spinner("🧪 Generating test cases..."):
-        results['test_cases'] = call_openai_api(test_cases_prompt)
+    try:
+        api_key = get_api_key()
+    except Exception as e:
+        st.error(f"Error calling OpenAI API: {str(e)}")
+        return results
     
-    # Get Behavioral Tests
-    with st.spinner("🎯 Creating behavioral test scenarios..."):
-        results['behavioral_tests'] = call_openai_api(behavioral_prompt)
+    progress = st.progress(0.0, text="Sending requests...")
+    status = {key: st.empty() for key, _, _ in tasks}
+    for key, _, label in tasks:
+        status[key].info(f"⏳ {label}")
     
+    # One event loop on the script thread instead of a thread per prompt
+    run_async(_gather_prompts(tasks, api_key, max_workers, results, progress, status))
     return results
 
+async def _gather_prompts(tasks, api_key, max_workers, results, progress, status):
+    """Await the prompts together, updating each task's status as it finishes"""
+    labels = {key: label for key, _, label in tasks}
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+    
+    async def run(key, prompt):
+        async with semaphore:
+            return key, await call_openai_api_async(prompt, api_key=api_key, task=key)
+    
+    async with async_session(api_key):
+        pending = [run(key, prompt) for key, prompt, _ in tasks]
+        for done, next_done in enumerate(asyncio.as_completed(pending), start=1):
+            key, results[key] = await next_done
+            
+            label = labels[key].split(' ', 1)[1].rstrip('.')
+            if results[key]:
+                status[key].success(f"✅ {label} - done")
+            else:
+                status[key].error(f"❌ {label} - failed")
+            progress.progress(done / len(tasks), text=f"{done}/{len(tasks)} tasks complete")
+
 def save_results_to_csv(results):
     """Save results to CSV format"""
     try:
@@ -246,6 +427,9 @@ def main():
         Or enter it manually when prompted during analysis.
         """)
     
+    with st.sidebar:
+        show_llm_usage()
+    
     # File Upload Section
     st.subheader("📁 Upload Your Requirements Document")
     
@@ -267,11 +451,15 @@ def main():
         
         # Process document
         with st.spinner("📖 Processing document..."):
-            content = process_document(uploaded_file)
+            content, is_large = process_document(uploaded_file)
             
             if content:
                 st.session_state.processed_content = content
+                # Large documents are streamed from the upload again when analyzed
+                st.session_state.large_document = uploaded_file if is_large else None
                 st.success("✅ Document processed successfully!")
+                if is_large:
+                    st.info("📚 Large document: it will be analyzed section by section.")
                 
                 # Preview content
                 with st.expander("📄 Preview Document Content"):
@@ -287,9 +475,24 @@ def main():
     if st.session_state.processed_content:
         st.subheader("🔬 Generate Analysis & Test Cases")
         
+        run_concurrently = st.checkbox(
+            "⚡ Run analysis tasks concurrently",
+            value=True,
+            help="Send the analysis, test case and behavioral prompts at the same time"
+        )
+        st.checkbox(
+            "🔄 Bypass response cache",
+            key="bypass_cache",
+            help="Always send fresh requests instead of reusing identical earlier responses"
+        )
+        
         if st.button("🚀 Start Analysis", type="primary"):
             with st.spinner("🤖 AI is working on your requirements..."):
-                results = analyze_requirements(st.session_state.processed_content)
+                results = analyze_requirements(
+                    st.session_state.processed_content,
+                    concurrent=run_concurrently,
+                    source=st.session_state.large_document
+                )
                 
                 if any(results.values()):
                     st.success("✅ Analysis completed!")
@@ -1,6 +1,5 @@
 import streamlit as st
 import os
-import requests
 import json
 import pandas as pd
 from datetime import datetime
@@ -8,6 +7,12 @@ import re
 import base64
 from io import BytesIO
 from PIL import Image
+from immigration_responses import (
+    generate_comprehensive_immigration_response,
+    generate_expert_opinion_letter,
+    generate_general_immigration_guidance,
+)
+from soc_index import SOC_INDEX, check_soc_code
 
 # Set page config
 st.set_page_config(
@@ -264,6 +269,7 @@ US_VISA_CATEGORIES = {
                 "I-90": "Green Card Renewal/Replacement"
             }
         },
+    "Immigrant Visas": {
         "Family-Based": {
             "IR-1": "Spouse of US Citizen",
             "IR-2": "Unmarried Child (Under 21) of US Citizen",
@@ -339,351 +345,6 @@ def load_logo():
     except Exception:
         return None
 
-def call_openai_api(prompt, max_tokens=2000, temperature=0.3):
-    """Call OpenAI API for immigration law assistance"""
-    try:
-        # Get API key
-        api_key = None
-        if hasattr(st, 'secrets') and "OPENAI_API_KEY" in st.secrets:
-            api_key = st.secrets["OPENAI_API_KEY"]
-        elif os.getenv("OPENAI_API_KEY"):
-            api_key = os.getenv("OPENAI_API_KEY")
-        else:
-            st.error("❌ OpenAI API key not found. Please configure your API key in Streamlit secrets.")
-            return None
-        
-        if not api_key or not api_key.startswith('sk-'):
-            st.error("❌ Invalid API key format. Please check your configuration.")
-            return None
-        
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": "gpt-4",
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": max_tokens,
-            "temperature": temperature
-        }
-        
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers=headers,
-            json=data,
-            timeout=60
-        )
-        
-        if response.status_code == 200:
-            return response.json()["choices"][0]["message"]["content"]
-        else:
-            st.error(f"API Error: {response.status_code} - {response.text}")
-            return None
-            
-    except Exception as e:
-        st.error(f"Error calling OpenAI API: {str(e)}")
-        return None
-
-def check_soc_code(soc_code):
-    """Check if SOC code is in Job Zone 3 (to avoid)"""
-    if soc_code in JOB_ZONE_3_CODES:
-        return {
-            "status": "WARNING",
-            "message": f"⚠️ This SOC code ({soc_code}) is Job Zone 3 and should be avoided for H-1B specialty occupation.",
-            "title": JOB_ZONE_3_CODES[soc_code],
-            "recommendation": "Consider finding a more specific SOC code that falls in Job Zone 4 or 5."
-        }
-    else:
-        return {
-            "status": "OK", 
-            "message": f"✅ SOC code {soc_code} appears to be acceptable (not in Job Zone 3).",
-            "recommendation": "Verify this SOC code aligns with the actual job duties and requirements."
-        }
-
-def generate_comprehensive_immigration_response(case_type, visa_category, case_details):
-    """Generate comprehensive immigration responses for any US visa type or immigration matter"""
-    
-    if case_type == "RFE Response":
-        if visa_category in ["H-1B", "H-1B1", "E-3", "TN"]:
-            return generate_work_visa_rfe_response(visa_category, case_details)
-        elif visa_category in ["L-1A", "L-1B"]:
-            return generate_l_visa_rfe_response(visa_category, case_details)
-        elif visa_category in ["O-1A", "O-1B"]:
-            return generate_o_visa_rfe_response(visa_category, case_details)
-        elif visa_category in ["EB-1A", "EB-1B", "EB-1C", "EB-2", "EB-3"]:
-            return generate_immigrant_visa_rfe_response(visa_category, case_details)
-        elif visa_category in ["F-1", "M-1", "J-1"]:
-            return generate_student_visa_rfe_response(visa_category, case_details)
-        elif visa_category in ["Family-Based"]:
-            return generate_family_visa_rfe_response(case_details)
-        else:
-            return generate_general_rfe_response(visa_category, case_details)
-    
-    elif case_type == "Initial Petition":
-        return generate_initial_petition_guidance(visa_category, case_details)
-    
-    elif case_type == "Motion":
-        return generate_motion_response(visa_category, case_details)
-    
-    elif case_type == "Appeal":
-        return generate_appeal_brief(visa_category, case_details)
-    
-    else:
-        return generate_general_immigration_guidance(case_type, visa_category, case_details)
-
-def generate_work_visa_rfe_response(visa_category, case_details):
-    """Generate RFE responses for work-based visas"""
-    prompt = f"""
-    As an expert immigration attorney, draft a comprehensive RFE response for a {visa_category} petition.
-
-    Case Details:
-    - Visa Category: {visa_category}
-    - Position: {case_details.get('position', 'Not specified')}
-    - Company: {case_details.get('company', 'Not specified')}
-    - Beneficiary: {case_details.get('beneficiary', 'Not specified')}
-    - RFE Issues: {case_details.get('rfe_issues', 'Not specified')}
-    - Additional Details: {case_details.get('additional_details', 'Not specified')}
-
-    Provide a comprehensive legal response addressing:
-    1. Specific requirements for {visa_category} classification
-    2. Regulatory framework and legal standards
-    3. Evidence and documentation requirements
-    4. Case law and precedents supporting the petition
-    5. Industry standards and best practices
-    6. Expert opinion recommendations
-    7. Risk mitigation strategies
-
-    Format as a professional legal brief suitable for USCIS submission with proper citations and legal reasoning.
-    """
-    return call_openai_api(prompt, max_tokens=3000, temperature=0.2)
-
-def generate_l_visa_rfe_response(visa_category, case_details):
-    """Generate RFE responses for L-1 intracompany transferee visas"""
-    prompt = f"""
-    As an expert immigration attorney specializing in intracompany transferees, draft a comprehensive RFE response for an {visa_category} petition.
-
-    Case Details:
-    - Visa Category: {visa_category}
-    - Position: {case_details.get('position', 'Not specified')}
-    - US Company: {case_details.get('us_company', 'Not specified')}
-    - Foreign Company: {case_details.get('foreign_company', 'Not specified')}
-    - Relationship: {case_details.get('company_relationship', 'Not specified')}
-    - Beneficiary Experience: {case_details.get('experience', 'Not specified')}
-    - RFE Issues: {case_details.get('rfe_issues', 'Not specified')}
-
-    Address the following {visa_category} requirements:
-    1. Qualifying relationship between US and foreign entities
-    2. Beneficiary's qualifying employment abroad (1 year in 3 years)
-    3. Managerial/Executive capacity (L-1A) or Specialized Knowledge (L-1B)
-    4. Position offered in the US
-    5. Corporate documentation and business operations
-    6. Detailed organizational structure and reporting relationships
-
-    Provide legal analysis with citations to 8 CFR 214.2(l) and relevant case law.
-    """
-    return call_openai_api(prompt, max_tokens=3000, temperature=0.2)
-
-def generate_o_visa_rfe_response(visa_category, case_details):
-    """Generate RFE responses for O-1 extraordinary ability visas"""
-    prompt = f"""
-    As an expert immigration attorney specializing in extraordinary ability cases, draft a comprehensive RFE response for an {visa_category} petition.
-
-    Case Details:
-    - Visa Category: {visa_category}
-    - Field of Expertise: {case_details.get('field', 'Not specified')}
-    - Beneficiary: {case_details.get('beneficiary', 'Not specified')}
-    - Achievements: {case_details.get('achievements', 'Not specified')}
-    - Evidence Submitted: {case_details.get('evidence', 'Not specified')}
-    - RFE Issues: {case_details.get('rfe_issues', 'Not specified')}
-
-    Address {visa_category} extraordinary ability criteria:
-    1. Evidence of extraordinary ability through sustained national/international acclaim
-    2. Recognition for achievements and significant contributions
-    3. Consultation requirements and peer recognition
-    4. Specific events/activities in the US
-    5. Itinerary and supporting documentation
-
-    For O-1A (Sciences/Education/Business/Athletics):
-    - Major awards or recognition
-    - Membership in exclusive associations
-    - Published material about the beneficiary
-    - Original contributions of major significance
-    - Scholarly articles
-    - High salary or remuneration
-    - Critical role in distinguished organizations
-
-    For O-1B (Arts/Motion Pictures/TV):
-    - Leading/starring roles in distinguished productions
-    - Critical reviews and recognition
-    - Commercial or critically acclaimed successes
-    - High salary or remuneration
-
-    Provide detailed legal analysis with regulatory citations and supporting evidence strategy.
-    """
-    return call_openai_api(prompt, max_tokens=3000, temperature=0.2)
-
-def generate_immigrant_visa_rfe_response(visa_category, case_details):
-    """Generate RFE responses for employment-based immigrant visas"""
-    prompt = f"""
-    As an expert immigration attorney specializing in employment-based immigrant petitions, draft a comprehensive RFE response for an {visa_category} case.
-
-    Case Details:
-    - Visa Category: {visa_category}
-    - Beneficiary: {case_details.get('beneficiary', 'Not specified')}
-    - Employer: {case_details.get('employer', 'Not specified')}
-    - Position: {case_details.get('position', 'Not specified')}
-    - Priority Date: {case_details.get('priority_date', 'Not specified')}
-    - Labor Certification: {case_details.get('labor_cert', 'Not specified')}
-    - RFE Issues: {case_details.get('rfe_issues', 'Not specified')}
-
-    Address specific {visa_category} requirements:
-
-    For EB-1A (Extraordinary Ability):
-    - Sustained national/international acclaim
-    - Evidence of extraordinary ability in field
-    - Continued work in area of expertise
-    - Substantial benefit to the US
-
-    For EB-1B (Outstanding Professor/Researcher):
-    - International recognition for outstanding achievements
-    - At least 3 years experience in teaching/research
-    - Tenure track or permanent research position offer
-
-    For EB-1C (Multinational Manager/Executive):
-    - Qualifying managerial/executive position abroad
-    - Same employer or qualifying relationship
-    - Managerial/executive position in US
-
-    For EB-2 (Advanced Degree/Exceptional Ability):
-    - Advanced degree or exceptional ability
-    - Labor certification (unless NIW)
-    - Job offer requiring advanced degree
-
-    For EB-3 (Skilled Worker/Professional):
-    - Bachelor's degree or 2+ years experience
-    - Labor certification
-    - Permanent, full-time job offer
-
-    Provide comprehensive legal analysis with INA and regulatory citations.
-    """
-    return call_openai_api(prompt, max_tokens=3000, temperature=0.2)
-
-def generate_family_visa_rfe_response(case_details):
-    """Generate RFE responses for family-based immigration cases"""
-    prompt = f"""
-    As an expert immigration attorney specializing in family-based immigration, draft a comprehensive RFE response.
-
-    Case Details:
-    - Petition Type: {case_details.get('petition_type', 'Not specified')}
-    - Petitioner: {case_details.get('petitioner', 'Not specified')}
-    - Beneficiary: {case_details.get('beneficiary', 'Not specified')}
-    - Relationship: {case_details.get('relationship', 'Not specified')}
-    - Marriage Date: {case_details.get('marriage_date', 'Not specified')}
-    - RFE Issues: {case_details.get('rfe_issues', 'Not specified')}
-
-    Address family-based petition requirements:
-    1. Qualifying relationship establishment
-    2. Petitioner's US citizenship or LPR status
-    3. Bona fide marriage evidence (if applicable)
-    4. Financial support requirements (I-864)
-    5. Admissibility issues and waivers
-    6. Documentary evidence of relationship
-
-    For Marriage Cases:
-    - Evidence of bona fide marriage
-    - Joint financial documents
-    - Cohabitation evidence
-    - Social evidence of relationship
-    - Termination of previous marriages
-
-    For Parent/Child Cases:
-    - Birth certificates and relationship proof
-    - Age requirements and legitimation
-    - Adoption documentation if applicable
-
-    Provide legal analysis with INA citations and evidentiary recommendations.
-    """
-    return call_openai_api(prompt, max_tokens=3000, temperature=0.2)
-
-def generate_general_immigration_guidance(case_type, visa_category, case_details):
-    """Generate general immigration guidance for any type of case"""
-    prompt = f"""
-    As an expert immigration attorney with comprehensive knowledge of US immigration law, provide detailed guidance on:
-
-    Case Type: {case_type}
-    Visa Category: {visa_category}
-    Question/Issue: {case_details.get('question', case_details.get('issue', 'Not specified'))}
-    
-    Additional Details:
-    {case_details.get('details', 'Not specified')}
-
-    Provide comprehensive legal guidance including:
-    1. Applicable legal framework and regulatory requirements
-    2. Current USCIS policies and procedures
-    3. Required documentation and evidence
-    4. Strategic considerations and best practices
-    5. Potential challenges and risk mitigation
-    6. Timeline and procedural requirements
-    7. Recent updates or changes in law/policy
-    8. Alternative options or strategies if applicable
-
-    Include relevant citations to INA, CFR, USCIS Policy Manual, and case law as appropriate.
-    Format as professional legal guidance suitable for attorney use.
-    """
-    return call_openai_api(prompt, max_tokens=3000, temperature=0.2)
-
-def generate_expert_opinion_letter(letter_type, case_details):
-    """Generate expert opinion letter for immigration cases"""
-    
-    if letter_type == "Position Expert Opinion":
-        prompt = f"""
-        Draft a professional expert opinion letter for an H-1B specialty occupation case from a qualified industry expert's perspective.
-
-        Position Details:
-        - Position Title: {case_details.get('position', 'Not specified')}
-        - Company: {case_details.get('company', 'Not specified')}
-        - Industry: {case_details.get('industry', 'Not specified')}
-        - Job Duties: {case_details.get('job_duties', 'Not specified')}
-        - Education Requirement: {case_details.get('education_req', 'Not specified')}
-
-        The expert opinion letter should:
-        1. Establish the expert's credentials, education, and extensive industry experience
-        2. Analyze the position's complexity and specialized knowledge requirements
-        3. Confirm minimum education requirements for similar roles in the industry
-        4. Compare position requirements to industry standards and best practices
-        5. Address specialty occupation criteria under INA 214(i)(1) and 8 CFR 214.2(h)(4)(iii)(A)
-        6. Provide professional opinion on the necessity of the degree requirement
-        7. Include industry data, standards, and comparable positions
-
-        Format as a formal expert declaration with professional letterhead structure, suitable for USCIS submission.
-        """
-        
-    elif letter_type == "Beneficiary Qualifications Expert Opinion":
-        prompt = f"""
-        Draft a professional expert opinion letter evaluating a beneficiary's qualifications for an H-1B position.
-
-        Beneficiary & Position Details:
-        - Beneficiary: {case_details.get('beneficiary_name', 'Not specified')}
-        - Education: {case_details.get('education', 'Not specified')}
-        - Experience: {case_details.get('experience', 'Not specified')}
-        - Position: {case_details.get('position', 'Not specified')}
-        - Job Duties: {case_details.get('job_duties', 'Not specified')}
-
-        The expert evaluation should:
-        1. Assess and evaluate the beneficiary's educational background and credentials
-        2. Analyze work experience and its direct relevance to the position
-        3. Apply appropriate equivalency standards and three-for-one rule if needed
-        4. Address any education-position relationship concerns comprehensively
-        5. Confirm beneficiary meets or exceeds minimum requirements for the role
-        6. Provide detailed professional opinion on qualification sufficiency
-        7. Include credential analysis and industry comparison
-
-        Format as a formal expert evaluation with expert credentials, detailed analysis, and professional conclusions suitable for legal submission.
-        """
-
-    return call_openai_api(prompt, max_tokens=2500, temperature=0.2)
-
 def main():
     # Professional Header with Logo
     logo = load_logo()
@@ -756,7 +417,7 @@ def main():
             if st.button("🔍 Research Question", type="primary", use_container_width=True):
                 if question:
                     with st.spinner("Conducting legal research..."):
-                        response = generate_rfe_response("General", {"question": question})
+                        response = generate_general_immigration_guidance("Legal Research", "General Immigration Matter", {"question": question})
                         if response:
                             st.session_state.chat_history.append({
                                 "question": question,
@@ -2458,20 +2119,39 @@ def main():
                         <div class="warning-box">
                             <strong>⚠️ SOC Code Analysis Result:</strong><br>
                             {result["message"]}<br>
-                            <strong>Position Title:</strong> {result["title"]}<br>
+                            <strong>Position Title:</strong> {result["title"]} ({result["group"]})<br>
                             <strong>Professional Recommendation:</strong> {result["recommendation"]}<br>
                             <strong>Alternative Strategy:</strong> Consider finding a more specific SOC code in Job Zone 4 or 5, or strengthen the specialty occupation argument with additional evidence.
                         </div>
                         """, unsafe_allow_html=True)
+                    elif result["status"] == "NOT_FOUND":
+                        st.warning(f"{result['message']} {result['recommendation']}")
                     else:
                         st.markdown(f"""
                         <div class="success-box">
                             <strong>✅ SOC Code Analysis Result:</strong><br>
                             {result["message"]}<br>
+                            <strong>Position Title:</strong> {result["title"]} ({result["group"]})<br>
                             <strong>Professional Recommendation:</strong> {result["recommendation"]}<br>
                             <strong>Next Steps:</strong> Verify job duties align with SOC code description and gather supporting industry evidence.
                         </div>
                         """, unsafe_allow_html=True)
+                
+                # Candidate codes by prefix ("15-12") or by the position title
+                if check_soc and (soc_input or position_title):
+                    matches = SOC_INDEX.search(position_title) if position_title else []
+                    if soc_input and not SOC_INDEX.lookup(soc_input):
+                        matches = SOC_INDEX.search(soc_input) + matches
+                    if matches:
+                        st.markdown("**Related SOC codes:**")
+                        st.dataframe(
+                            pd.DataFrame(
+                                [(o.code, o.title, o.job_zone) for o in dict.fromkeys(matches)],
+                                columns=["SOC Code", "Title", "Job Zone"]
+                            ),
+                            hide_index=True,
+                            use_container_width=True
+                        )
         
         elif tool_type == "Visa Eligibility Assessment":
             st.markdown("""
@@ -0,0 +1,104 @@
+"""Async HTTP client for the OpenAI chat-completions API.
+
+The asyncio counterpart of llm_client: requests go through an
+``httpx.AsyncClient`` and take the same process-wide RateLimiter lease,
+RetryPolicy and response cache as the sync path, so a mix of sync and async
+callers still respects one set of account limits. One event loop can keep
+thousands of requests in flight without a thread per request.
+
+An AsyncClient's connection pool belongs to the event loop that created it,
+and each Streamlit script run gets a fresh loop from run_async(). So clients
+are opened per batch with ``async with async_session(api_key)`` instead of
+being cached across reruns. Calls made outside a session open a one-off
+client.
+
+Coroutines run on the script thread through run_async(), so st.* calls
+inside them still reach the page.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+from contextlib import asynccontextmanager
+
+import httpx
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from llm_client import OPENAI_CHAT_URL, get_rate_limiter, get_retry_policy
+from rate_limiter import estimate_request_tokens
+from retry_policy import retry_after_seconds
+
+# Connections one AsyncClient may open; requests beyond it wait for a free connection
+ASYNC_MAX_CONNECTIONS = int(os.getenv("OPENAI_ASYNC_MAX_CONNECTIONS", "100"))
+
+_session = contextvars.ContextVar("openai_async_session", default=None)
+
+
+def open_async_client(api_key, max_connections=ASYNC_MAX_CONNECTIONS, transport=None):
+    """Create a pooled AsyncClient for an API key; close it with aclose()"""
+    return httpx.AsyncClient(
+        headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        transport=transport,
+    )
+
+
+@asynccontextmanager
+async def async_session(api_key, **kwargs):
+    """Share one AsyncClient between the calls made inside the block"""
+    client = open_async_client(api_key, **kwargs)
+    token = _session.set(client)
+    try:
+        yield client
+    finally:
+        _session.reset(token)
+        await client.aclose()
+
+
+async def _send_async(client, data, timeout, priority, remaining, url, limiter):
+    """Send one attempt within the rate limit and read the whole response"""
+    limiter = limiter or get_rate_limiter()
+    lease = await limiter.acquire_async(estimate_request_tokens(data), priority=priority, timeout=max(0.0, remaining))
+    with lease:
+        response = await client.post(url, json=data, timeout=max(1.0, min(timeout, remaining)))
+    if response.status_code == 429:
+        limiter.pause(retry_after_seconds(response) or 1.0)
+    return response
+
+
+async def post_chat_completion_async(api_key, data, timeout=60, priority=None, deadline=None,
+                                     url=OPENAI_CHAT_URL, limiter=None, retry_policy=None):
+    """POST a chat-completions payload within the rate limit, retrying transient failures"""
+    client = _session.get()
+    if client is None:
+        async with async_session(api_key):
+            return await post_chat_completion_async(api_key, data, timeout, priority, deadline,
+                                                    url, limiter, retry_policy)
+    return await (retry_policy or get_retry_policy()).run_async(
+        lambda remaining: _send_async(client, data, timeout, priority, remaining, url, limiter), deadline=deadline)
+
+
+def run_async(coro):
+    """Run a coroutine to completion from a Streamlit script run and return its result"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # A loop is already running on this thread; run ours beside it with the page's script context
+    ctx = get_script_run_ctx()
+    result = {}
+
+    def target():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        try:
+            result["value"] = asyncio.run(coro)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
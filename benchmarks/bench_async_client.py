@@ -0,0 +1,116 @@
+"""Concurrency of the async OpenAI client against the thread-pool sync path.
+
+Run from the repository root:
+
+    python benchmarks/bench_async_client.py [--requests 2000] [--latency 0.5]
+
+Both paths go through the shared RateLimiter and RetryPolicy against an
+in-process fake API that answers after `latency` seconds. The async run
+sends every request from one event loop via httpx.MockTransport. The sync
+run sends them from a thread pool via a fake requests session. Rate limits
+are disabled so the report shows the client's own overhead: wall time,
+peak in-flight requests, and peak thread count.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.update(OPENAI_RPM="0", OPENAI_TPM="0", OPENAI_MAX_CONCURRENCY="0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+import llm_client  # noqa: E402
+from async_llm_client import async_session, post_chat_completion_async  # noqa: E402
+
+BODY = {"choices": [{"message": {"content": "ok"}}]}
+DATA = {"model": "gpt-4", "messages": [{"role": "user", "content": "Summarise the RFE."}], "max_tokens": 50}
+
+
+class Gauge:
+    """Tracks requests in flight and the peak thread count"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+        self.peak_threads = 0
+        self.lock = threading.Lock()
+
+    def enter(self):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def json(self):
+        return BODY
+
+    def close(self):
+        pass
+
+
+def run_async_client(count, latency, gauge):
+    async def handler(request):
+        gauge.enter()
+        await asyncio.sleep(latency)
+        gauge.leave()
+        return httpx.Response(200, json=BODY)
+
+    async def main():
+        async with async_session("sk-test", max_connections=count, transport=httpx.MockTransport(handler)):
+            responses = await asyncio.gather(*(post_chat_completion_async("sk-test", DATA) for _ in range(count)))
+        return sum(response.status_code == 200 for response in responses)
+
+    return asyncio.run(main())
+
+
+def run_thread_pool(count, latency, gauge, workers):
+    class FakeSession:
+        def post(self, *args, **kwargs):
+            gauge.enter()
+            time.sleep(latency)
+            gauge.leave()
+            return FakeResponse()
+
+    llm_client.get_http_session = lambda api_key: FakeSession()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        responses = list(executor.map(lambda _: llm_client.post_chat_completion("sk-test", DATA), range(count)))
+    return sum(response.status_code == 200 for response in responses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.5, help="simulated API latency in seconds")
+    parser.add_argument("--threads", type=int, default=64, help="thread pool size for the sync path")
+    args = parser.parse_args()
+
+    runs = (
+        ("async, one event loop", lambda gauge: run_async_client(args.requests, args.latency, gauge)),
+        (f"sync, {args.threads} threads", lambda gauge: run_thread_pool(args.requests, args.latency, gauge, args.threads)),
+    )
+    print(f"{args.requests} requests, {args.latency * 1000:.0f} ms simulated latency")
+    for label, run in runs:
+        gauge = Gauge()
+        began = time.perf_counter()
+        ok = run(gauge)
+        elapsed = time.perf_counter() - began
+        print(f"{label:<24} {ok:5d} ok  {elapsed:6.2f} s  {ok / elapsed:7.0f} req/s"
+              f"  peak in flight {gauge.peak:5d}  peak threads {gauge.peak_threads:3d}")
+
+
+if __name__ == "__main__":
+    main()
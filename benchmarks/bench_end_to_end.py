@@ -0,0 +1,187 @@
+"""End-to-end load benchmark of both apps' generation paths against the mock API.
+
+Run from the repository root:
+
+    python benchmarks/bench_end_to_end.py [--concurrency 1,4,16] [--save baseline.json]
+    python benchmarks/bench_end_to_end.py --baseline baseline.json --tolerance 0.25
+
+Starts benchmarks/mock_openai_server.py in-process and points the client at
+it. Then, at each concurrency level, it calls these scenarios from that many
+threads:
+
+- immigration: generate_comprehensive_immigration_response for an H-1B RFE;
+- immigration-stream: the same call, streamed;
+- analysis: app_agent.analyze_requirements, which fans out three prompts.
+
+For each scenario and level it reports calls, failures, p50/p95/p99
+latency, calls per second and completion tokens per second as served by
+the mock. The response cache is off and the client-side rate limits are
+lifted unless --rpm/--tpm are given, so the numbers measure the code path
+and not the cache or the limiter.
+
+--save writes the results as JSON. --baseline compares a run with saved
+results and exits non-zero when p95 latency rose, or throughput fell, by
+more than --tolerance, so regressions are caught offline.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_openai_server import start_mock_server  # noqa: E402
+
+CASE_DETAILS = {
+    "petitioner": "Acme Analytics LLC",
+    "beneficiary": "J. Doe",
+    "position": "Data Scientist",
+    "soc_code": "15-2051",
+    "rfe_issues": "Specialty occupation; employer-employee relationship",
+}
+
+REQUIREMENTS = """
+1. Users shall sign in with email and password; five failed attempts lock the account for 15 minutes.
+2. The system shall export monthly reports as PDF and CSV within 10 seconds for up to 50,000 rows.
+3. Administrators can assign roles; only auditors may view the change history.
+4. The dashboard should load quickly on mobile devices.
+"""
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def run_level(call, concurrency, calls, server):
+    """Run `calls` calls on `concurrency` threads and summarise them"""
+    def timed(_):
+        began = time.perf_counter()
+        try:
+            # The generate functions report API errors with st.error and return None
+            error = None if call() else "no response"
+        except Exception as e:
+            error = type(e).__name__
+        return error, time.perf_counter() - began
+
+    tokens_before = server.stats.snapshot()["completion_tokens"]
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(timed, range(calls)))
+    elapsed = time.perf_counter() - began
+    tokens = server.stats.snapshot()["completion_tokens"] - tokens_before
+    latencies = [latency for error, latency in outcomes if error is None]
+    errors = Counter(error for error, _ in outcomes if error is not None)
+    return {
+        "calls": calls,
+        "failed": sum(errors.values()),
+        "errors": dict(errors),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        "calls_per_s": round(len(latencies) / elapsed, 2),
+        "tokens_per_s": round(tokens / elapsed, 1),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Lines describing regressions against a saved run"""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous or current["p95_ms"] is None or previous["p95_ms"] is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+        if current["calls_per_s"] < previous["calls_per_s"] * (1 - tolerance):
+            regressions.append(f"{key}: throughput {previous['calls_per_s']} -> {current['calls_per_s']} calls/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated thread counts")
+    parser.add_argument("--calls", type=int, default=0, help="calls per level; default 4 x concurrency, at least 8")
+    parser.add_argument("--scenarios", default="immigration,immigration-stream,analysis")
+    parser.add_argument("--latency", type=float, default=0.2, help="mock seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--completion-tokens", type=int, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", default="0", help="client OPENAI_RPM; 0 lifts the limit")
+    parser.add_argument("--tpm", default="0", help="client OPENAI_TPM; 0 lifts the limit")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare with results saved by --save")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    args = parser.parse_args()
+
+    server = start_mock_server(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                               completion_tokens=args.completion_tokens, error_rate=args.error_rate,
+                               rate_limit_rate=args.rate_limit_rate, retry_after=0.2, seed=1)
+    # The client modules read these at import
+    os.environ.update(
+        OPENAI_BASE_URL=server.base_url,
+        OPENAI_API_KEY="sk-benchmark",
+        OPENAI_RPM=args.rpm,
+        OPENAI_TPM=args.tpm,
+        OPENAI_MAX_CONCURRENCY="0",
+        OPENAI_RETRY_BASE_DELAY="0.1",
+        LLM_CACHE_DISABLED="true",
+        LLM_LOCAL_FALLBACK="false",
+        LLM_CACHE_DIR=tempfile.mkdtemp(prefix="bench-e2e-"),
+    )
+    import app_agent
+    from immigration_responses import generate_comprehensive_immigration_response
+
+    scenarios = {
+        "immigration": lambda: generate_comprehensive_immigration_response("RFE Response", "H-1B", CASE_DETAILS),
+        "immigration-stream": lambda: generate_comprehensive_immigration_response(
+            "RFE Response", "H-1B", CASE_DETAILS, stream=True),
+        "analysis": lambda: all(app_agent.analyze_requirements(REQUIREMENTS).values()),
+    }
+
+    results = {}
+    print(f"Mock API: {args.latency * 1000:.0f} ms to first token, {args.tokens_per_second:.0f} tokens/s, "
+          f"{args.completion_tokens} tokens per reply, {args.error_rate:.0%} errors, {args.rate_limit_rate:.0%} 429s")
+    print(f"{'scenario':<20}{'conc':>5}{'calls':>7}{'fail':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'calls/s':>9}{'tok/s':>9}")
+    for name in args.scenarios.split(","):
+        for concurrency in (int(level) for level in args.concurrency.split(",")):
+            calls = args.calls or max(8, 4 * concurrency)
+            result = run_level(scenarios[name], concurrency, calls, server)
+            results[f"{name}@{concurrency}"] = result
+            print(f"{name:<20}{concurrency:>5}{result['calls']:>7}{result['failed']:>6}{result['p50_ms'] or '-':>9}"
+                  f"{result['p95_ms'] or '-':>9}{result['p99_ms'] or '-':>9}{result['calls_per_s']:>9}"
+                  f"{result['tokens_per_s']:>9}", flush=True)
+            if result["errors"]:
+                print(f"{'':<25}errors: {', '.join(f'{error} x{count}' for error, count in result['errors'].items())}")
+    print(f"Mock server totals: {server.stats.snapshot()}")
+    # Timings of calls that all failed measure the error path, not the client
+    broken = [key for key, result in results.items() if result["failed"] == result["calls"]]
+    if broken:
+        print(f"FAILED every call: {', '.join(broken)}")
+        server.shutdown()
+        sys.exit(1)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
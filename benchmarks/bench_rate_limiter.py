@@ -0,0 +1,142 @@
+"""Load test for RateLimiter against a simulated rate-limited API.
+
+Run from the repository root:
+
+    python benchmarks/bench_rate_limiter.py [--rpm 600] [--clients 40] [--seconds 6]
+
+The fake API admits rpm/60 requests a second from a bucket holding one
+second of budget and answers the rest with 429 and a Retry-After, the way
+the real API enforces per-minute limits over short windows. Client threads and asyncio tasks call it as fast as they
+can, first with no limiter and then through a shared RateLimiter. Half the
+clients run at high priority and half at low priority. The report shows
+accepted requests per second, 429s, and how long each priority waited for
+budget. Priority is strict, so while high-priority clients keep the queue
+full, low-priority ones only get the initial burst.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limiter import PRIORITY_HIGH, PRIORITY_LOW, RateLimiter  # noqa: E402
+
+
+class FakeAPI:
+    """Admits `per_second` requests a second from a one-second bucket and 429s the rest"""
+
+    def __init__(self, per_second, latency):
+        self.per_second = per_second
+        self.latency = latency
+        self.level = float(per_second)
+        self.updated = time.monotonic()
+        self.ok = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def _admit(self):
+        """Return 0 when admitted, else the Retry-After in seconds"""
+        with self.lock:
+            now = time.monotonic()
+            self.level = min(self.per_second, self.level + (now - self.updated) * self.per_second)
+            self.updated = now
+            if self.level < 1:
+                self.rejected += 1
+                return (1 - self.level) / self.per_second
+            self.level -= 1
+            self.ok += 1
+            return 0
+
+    def call(self):
+        retry_after = self._admit()
+        time.sleep(self.latency)
+        return retry_after
+
+    async def call_async(self):
+        retry_after = self._admit()
+        await asyncio.sleep(self.latency)
+        return retry_after
+
+
+def run_threads(api, limiter, clients, seconds, waits):
+    stop = time.monotonic() + seconds
+
+    def client(priority):
+        while time.monotonic() < stop:
+            if limiter is None:
+                api.call()
+            else:
+                with limiter.acquire(priority=priority) as lease:
+                    if time.monotonic() >= stop:
+                        break
+                    waits[priority].append(lease.waited)
+                    retry_after = api.call()
+                if retry_after:
+                    limiter.pause(retry_after)
+
+    threads = [threading.Thread(target=client, args=(PRIORITY_HIGH if i % 2 else PRIORITY_LOW,))
+               for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+async def run_tasks(api, limiter, clients, seconds, waits):
+    stop = time.monotonic() + seconds
+
+    async def client(priority):
+        while time.monotonic() < stop:
+            if limiter is None:
+                await api.call_async()
+            else:
+                lease = await limiter.acquire_async(priority=priority)
+                with lease:
+                    if time.monotonic() >= stop:
+                        break
+                    waits[priority].append(lease.waited)
+                    retry_after = await api.call_async()
+                if retry_after:
+                    limiter.pause(retry_after)
+
+    await asyncio.gather(*(client(PRIORITY_HIGH if i % 2 else PRIORITY_LOW) for i in range(clients)))
+
+
+def report(label, api, seconds, waits):
+    line = f"{label:<28} {api.ok / seconds:7.1f} ok/s  {api.rejected:6d} x 429"
+    for name, priority in (("high", PRIORITY_HIGH), ("low", PRIORITY_LOW)):
+        if waits[priority]:
+            line += (f"  {name}: {len(waits[priority]):4d} sent,"
+                     f" median wait {statistics.median(waits[priority]) * 1000:5.0f} ms")
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rpm", type=float, default=600, help="account limit, requests per minute")
+    parser.add_argument("--clients", type=int, default=40)
+    parser.add_argument("--seconds", type=float, default=6)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated API latency in seconds")
+    args = parser.parse_args()
+    per_second = int(args.rpm / 60)
+    print(f"API limit {args.rpm:.0f} RPM ({per_second}/s), {args.clients} clients, {args.seconds:.0f}s per run")
+
+    for mode in ("threads", "asyncio"):
+        for label, make_limiter in (("no limiter", lambda: None),
+                                    ("RateLimiter", lambda: RateLimiter(args.rpm, 0, args.clients, burst_seconds=1))):
+            api = FakeAPI(per_second, args.latency)
+            limiter = make_limiter()
+            waits = {PRIORITY_HIGH: [], PRIORITY_LOW: []}
+            if mode == "threads":
+                run_threads(api, limiter, args.clients, args.seconds, waits)
+            else:
+                asyncio.run(run_tasks(api, limiter, args.clients, args.seconds, waits))
+            report(f"{mode}, {label}", api, args.seconds, waits)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Success rate and latency of RetryPolicy against a flaky simulated API.
+
+Run from the repository root:
+
+    python benchmarks/bench_retry_policy.py [--calls 400] [--failure-rate 0.2]
+
+Each attempt against the fake API takes `latency` seconds and fails with a
+503, a 429 with Retry-After, or a timeout with probability `failure-rate`.
+Without retries every failure is a resubmit the user has to make. With
+RetryPolicy the report shows how many calls still failed, how many
+attempts they took, and p50/p95/p99 call latency. A second scenario drops
+the API completely for one second of the run, to show the circuit breaker
+failing calls fast instead of letting each one wait out its deadline.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retry_policy import CircuitBreaker, CircuitOpenError, RetryPolicy  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def close(self):
+        pass
+
+
+class FlakyAPI:
+    """Fails a share of attempts at random, and every attempt during an outage window"""
+
+    def __init__(self, failure_rate, latency, outage=None):
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.outage = outage
+        self.began = time.monotonic()
+
+    def send(self, remaining):
+        elapsed = time.monotonic() - self.began
+        if self.outage and self.outage[0] <= elapsed < self.outage[1]:
+            time.sleep(min(remaining, self.latency * 10))
+            raise requests.Timeout("simulated outage")
+        time.sleep(self.latency)
+        roll = random.random()
+        if roll < self.failure_rate / 3:
+            return FakeResponse(503)
+        if roll < self.failure_rate * 2 / 3:
+            return FakeResponse(429, {"Retry-After": "0.05"})
+        if roll < self.failure_rate:
+            raise requests.Timeout("simulated timeout")
+        return FakeResponse(200)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def run(api, policy, calls, workers, interval):
+    latencies, outcomes = [], {"ok": 0, "failed": 0, "fast_failed": 0}
+
+    def call(_):
+        began = time.monotonic()
+        try:
+            response = policy.run(api.send)
+            outcome = "ok" if response.status_code == 200 else "failed"
+        except CircuitOpenError:
+            outcome = "fast_failed"
+        except requests.RequestException:
+            outcome = "failed"
+        return outcome, time.monotonic() - began
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for index in range(calls):
+            # Calls arrive steadily, as users submit them, rather than all at once
+            futures.append(executor.submit(call, index))
+            time.sleep(interval)
+        for outcome, latency in (future.result() for future in futures):
+            outcomes[outcome] += 1
+            latencies.append(latency)
+    return outcomes, latencies
+
+
+def report(label, outcomes, latencies, policy):
+    metrics = policy.metrics.snapshot()
+    print(f"{label:<34} ok {outcomes['ok']:4d}  failed {outcomes['failed']:4d}  fast-failed {outcomes['fast_failed']:4d}"
+          f"  attempts {metrics['attempts']:5d}  p50 {statistics.median(latencies) * 1000:5.0f} ms"
+          f"  p95 {percentile(latencies, 0.95) * 1000:5.0f} ms  p99 {percentile(latencies, 0.99) * 1000:5.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--interval", type=float, default=0.01, help="seconds between call arrivals")
+    parser.add_argument("--failure-rate", type=float, default=0.2)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated API latency in seconds")
+    args = parser.parse_args()
+    random.seed(7)
+
+    scenarios = (
+        ("transient failures, no retries", None, lambda: RetryPolicy(max_attempts=1, breaker=CircuitBreaker(0))),
+        ("transient failures, RetryPolicy", None, lambda: RetryPolicy(base_delay=0.05, deadline=5)),
+        ("outage, retries without breaker", (1.0, 2.0),
+         lambda: RetryPolicy(base_delay=0.05, deadline=2, breaker=CircuitBreaker(0))),
+        ("outage, RetryPolicy with breaker", (1.0, 2.0),
+         lambda: RetryPolicy(base_delay=0.05, deadline=2, breaker=CircuitBreaker(5, reset_seconds=0.5))),
+    )
+    for label, outage, make_policy in scenarios:
+        api = FlakyAPI(args.failure_rate, args.latency, outage)
+        policy = make_policy()
+        outcomes, latencies = run(api, policy, args.calls, args.workers, args.interval)
+        report(label, outcomes, latencies, policy)
+
+
+if __name__ == "__main__":
+    main()
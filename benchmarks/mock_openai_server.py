@@ -0,0 +1,197 @@
+"""Stand-in for the OpenAI chat-completions API, for load tests and offline runs.
+
+Serves POST /v1/chat/completions with the same JSON and server-sent event
+shapes as the real API, including usage counts and streaming deltas.
+Latency, token rate, reply length and injected failures are configurable,
+so the apps, the retry policy and the rate limiter can be exercised without
+spending API credit:
+
+    python benchmarks/mock_openai_server.py --port 8001 --latency 0.3 --error-rate 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=sk-mock streamlit run app.py
+
+Each reply first waits `latency` seconds (plus or minus `jitter`), the time
+to first token. It then produces min(max_tokens, completion_tokens) tokens
+at `tokens_per_second`, one word per token. A share of requests fails
+instead: `rate_limit_rate` with a 429 and Retry-After, and `error_rate` with
+a 500 or 503. Any Bearer key is accepted.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunking import estimate_tokens  # noqa: E402
+
+WORDS = ("The", "petitioner", "submits", "evidence", "that", "the", "position", "qualifies", "as", "a",
+         "specialty", "occupation", "under", "8", "CFR", "214.2(h)(4)(iii)(A).")
+
+
+class MockStats:
+    """Counters for everything the server has answered"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.streamed = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.rate_limited = 0
+        self.errors = 0
+
+    def add(self, **counts):
+        with self.lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self):
+        with self.lock:
+            return {name: getattr(self, name) for name in
+                    ("requests", "streamed", "prompt_tokens", "completion_tokens", "rate_limited", "errors")}
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+        try:
+            data = json.loads(body)
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Body is not JSON", "type": "invalid_request_error"}})
+            return
+        server.stats.add(requests=1)
+
+        roll = server.random.random()
+        if roll < server.rate_limit_rate:
+            server.stats.add(rate_limited=1)
+            self._send_json(429, {"error": {"message": "Rate limit reached (mock)", "type": "requests"}},
+                            {"Retry-After": str(server.retry_after)})
+            return
+        if roll < server.rate_limit_rate + server.error_rate:
+            server.stats.add(errors=1)
+            status = server.random.choice((500, 503))
+            self._send_json(status, {"error": {"message": "The server had an error (mock)", "type": "server_error"}})
+            return
+
+        prompt = "".join(message.get("content") or "" for message in data.get("messages", []))
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = min(int(data.get("max_tokens") or server.completion_tokens), server.completion_tokens)
+        words = [WORDS[i % len(WORDS)] for i in range(completion_tokens)]
+        server.stats.add(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        reply_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        model = data.get("model", "mock")
+
+        time.sleep(max(0.0, server.latency + server.random.uniform(-server.jitter, server.jitter)))
+        interval = 1.0 / server.tokens_per_second if server.tokens_per_second > 0 else 0.0
+
+        if not data.get("stream"):
+            time.sleep(interval * completion_tokens)
+            self._send_json(200, {
+                "id": reply_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+            return
+
+        server.stats.add(streamed=1)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for index, word in enumerate(words):
+            time.sleep(interval)
+            chunk = {"id": reply_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                     "choices": [{"index": 0, "delta": {"content": word if index == 0 else " " + word},
+                                  "finish_reason": None}]}
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Load tests open many connections at once; the default backlog of 5 resets them
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Clients drop streaming connections once they have read [DONE]; that is not an error
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+def start_mock_server(host="127.0.0.1", port=0, latency=0.2, jitter=0.05, tokens_per_second=200.0,
+                      completion_tokens=100, error_rate=0.0, rate_limit_rate=0.0, retry_after=1.0, seed=None):
+    """Serve the mock API on a background thread; returns the server, whose base_url ends in /v1"""
+    server = MockOpenAIServer((host, port), MockOpenAIHandler)
+    server.latency = latency
+    server.jitter = jitter
+    server.tokens_per_second = tokens_per_second
+    server.completion_tokens = completion_tokens
+    server.error_rate = error_rate
+    server.rate_limit_rate = rate_limit_rate
+    server.retry_after = retry_after
+    server.random = random.Random(seed)
+    server.stats = MockStats()
+    server.base_url = f"http://{host}:{server.server_address[1]}/v1"
+    threading.Thread(target=server.serve_forever, name="mock-openai", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds to first token")
+    parser.add_argument("--jitter", type=float, default=0.05, help="random +/- seconds added to the latency")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--completion-tokens", type=int, default=100, help="reply length cap in tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered 500/503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests answered 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    args = parser.parse_args()
+    server = start_mock_server(args.host, args.port, args.latency, args.jitter, args.tokens_per_second,
+                               args.completion_tokens, args.error_rate, args.rate_limit_rate, args.retry_after)
+    print(f"Mock OpenAI API on {server.base_url}; set OPENAI_BASE_URL to it. Ctrl+C to stop.", flush=True)
+    try:
+        while True:
+            time.sleep(10)
+            print(server.stats.snapshot(), flush=True)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""Bulk generation of immigration responses from a CSV of cases.
+
+Each CSV row is one case: a visa_category column (a code such as "H-1B" or a
+selectbox label), an optional case_type column (default "RFE Response"), an
+optional case_id column, and any other columns, which become the
+case_details passed to the handler.
+
+Cases run on a bounded thread pool at low rate-limit priority, so they
+yield to interactive requests, with a pacer that spaces API calls to a
+requests-per-minute budget and backs every worker off when a case fails, as
+it does when the API starts rate limiting. Each case is one call: the API
+client already retries transient failures, so a case that still fails is
+recorded and left for the next run. Each finished case is appended to a
+JSONL file and flushed immediately, so a crash loses at most the cases in
+flight, and a rerun with the same output file skips cases already done.
+
+The app submits a bulk run as a background job (run_bulk_job). Run
+overnight from the command line:
+
+    python bulk_rfe.py cases.csv responses.jsonl --workers 4 --rpm 20
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+import pandas as pd
+
+from rate_limiter import PRIORITY_LOW, request_priority
+
+BULK_MAX_WORKERS = int(os.getenv("BULK_MAX_WORKERS", "4"))
+BULK_REQUESTS_PER_MINUTE = float(os.getenv("BULK_REQUESTS_PER_MINUTE", "20"))
+# Seconds every worker waits after a case fails
+BULK_FAILURE_BACKOFF = float(os.getenv("BULK_FAILURE_BACKOFF", "10"))
+BULK_OUTPUT_DIR = os.getenv("BULK_OUTPUT_DIR", os.path.join(".cache", "bulk"))
+
+DEFAULT_CASE_TYPE = "RFE Response"
+RESERVED_COLUMNS = ("case_id", "case_type", "visa_category")
+
+
+class RequestPacer:
+    """Spaces calls across threads to a requests-per-minute budget, with shared backoff"""
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until this thread may make its next call"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def backoff(self, seconds):
+        """Hold every thread's next call back by at least `seconds`"""
+        with self._lock:
+            self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
+
+def read_cases(source):
+    """Read a CSV path or upload into case dicts, every value as text"""
+    df = pd.read_csv(source, dtype=str).fillna("")
+    df.columns = [str(column).strip() for column in df.columns]
+    if "visa_category" not in df.columns:
+        raise ValueError("The cases CSV needs a 'visa_category' column")
+    cases = []
+    for index, row in enumerate(df.to_dict("records")):
+        cases.append({
+            "case_id": row.get("case_id") or f"row-{index + 1}",
+            "case_type": row.get("case_type") or DEFAULT_CASE_TYPE,
+            "visa_category": row["visa_category"],
+            "case_details": {key: value for key, value in row.items() if key not in RESERVED_COLUMNS},
+        })
+    duplicates = sorted(case_id for case_id, count in Counter(case["case_id"] for case in cases).items() if count > 1)
+    if duplicates:
+        raise ValueError(f"Duplicate case_id values: {', '.join(duplicates[:10])}")
+    return cases
+
+
+def output_path_for(filename, content, output_dir=BULK_OUTPUT_DIR):
+    """Results file for an uploaded CSV; the same upload always maps to the same file, so reruns resume"""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return os.path.join(output_dir, f"{stem}_{hashlib.sha256(content).hexdigest()[:12]}.jsonl")
+
+
+def load_completed(output_path):
+    """Case ids already written successfully to a results file"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash; that case simply runs again
+                continue
+            if record.get("status") == "ok":
+                completed.add(record["case_id"])
+    return completed
+
+
+def _run_case(case, generate, pacer, failure_backoff, priority):
+    """Generate one case, slowing the whole pool down if it fails"""
+    began = time.perf_counter()
+    pacer.wait()
+    try:
+        with request_priority(priority):
+            response = generate(case["case_type"], case["visa_category"], case["case_details"])
+        error = None if response else "No response from the API"
+    except Exception as e:
+        response, error = None, str(e)
+    elapsed = round(time.perf_counter() - began, 3)
+    if error:
+        # A failure that outlasted the client's retries usually means rate limits or an outage
+        pacer.backoff(failure_backoff)
+        return dict(status="failed", response=None, error=error, elapsed=elapsed)
+    return dict(status="ok", response=response, error=None, elapsed=elapsed)
+
+
+def run_bulk_rfe(cases, output_path, generate, max_workers=BULK_MAX_WORKERS,
+                 requests_per_minute=BULK_REQUESTS_PER_MINUTE, failure_backoff=BULK_FAILURE_BACKOFF,
+                 on_result=None, initializer=None, priority=PRIORITY_LOW):
+    """Run every case not already in output_path and append each result as it finishes"""
+    completed = load_completed(output_path)
+    pending = [case for case in cases if case["case_id"] not in completed]
+    summary = {"total": len(cases), "skipped": len(cases) - len(pending), "succeeded": 0, "failed": 0}
+    if not pending:
+        return summary
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    pacer = RequestPacer(requests_per_minute)
+    queue = iter(pending)
+    in_flight = {}
+
+    with open(output_path, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=max_workers, initializer=initializer) as executor:
+        while True:
+            # Submit lazily so hundreds of cases don't sit in the executor queue
+            while len(in_flight) < max_workers * 2:
+                case = next(queue, None)
+                if case is None:
+                    break
+                in_flight[executor.submit(_run_case, case, generate, pacer, failure_backoff, priority)] = case
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                case = in_flight.pop(future)
+                record = {
+                    "case_id": case["case_id"],
+                    "case_type": case["case_type"],
+                    "visa_category": case["visa_category"],
+                    **future.result(),
+                    "finished_at": datetime.now().isoformat(timespec="seconds"),
+                }
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                os.fsync(out.fileno())
+                summary["succeeded" if record["status"] == "ok" else "failed"] += 1
+                if on_result:
+                    on_result(record, summary)
+    return summary
+
+
+def read_results(output_path):
+    """Latest record per case id from a results file"""
+    records = {}
+    if os.path.exists(output_path):
+        with open(output_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records[record["case_id"]] = record
+    return list(records.values())
+
+
+def generate_case(case_type, visa_category, case_details):
+    """Generate the response for one case row"""
+    from immigration_responses import generate_comprehensive_immigration_response
+    from visa_categories import visa_code_from_label
+
+    return generate_comprehensive_immigration_response(case_type, visa_code_from_label(visa_category), case_details)
+
+
+def run_bulk_job(params, stream=False):
+    """Job handler for run_bulk_rfe, returning a summary of the run"""
+    summary = run_bulk_rfe(params["cases"], params["output_path"], generate_case,
+                           params.get("max_workers", BULK_MAX_WORKERS),
+                           params.get("requests_per_minute", BULK_REQUESTS_PER_MINUTE))
+    return (f"{summary['succeeded']} generated, {summary['failed']} failed, {summary['skipped']} already complete. "
+            f"Results: `{os.path.basename(params['output_path'])}`")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate immigration responses for every case in a CSV")
+    parser.add_argument("cases", help="CSV with a visa_category column and case detail columns")
+    parser.add_argument("output", help="JSONL results file; existing successful cases are skipped")
+    parser.add_argument("--workers", type=int, default=BULK_MAX_WORKERS)
+    parser.add_argument("--rpm", type=float, default=BULK_REQUESTS_PER_MINUTE, help="API requests per minute")
+    args = parser.parse_args()
+
+    def report(record, summary):
+        done = summary["succeeded"] + summary["failed"]
+        print(f"[{done}/{summary['total'] - summary['skipped']}] {record['case_id']}: {record['status']}"
+              f" ({record['elapsed']}s)", flush=True)
+
+    summary = run_bulk_rfe(read_cases(args.cases), args.output, generate_case, args.workers, args.rpm, on_result=report)
+    print(f"Done: {summary['succeeded']} succeeded, {summary['failed']} failed, {summary['skipped']} already complete")
+
+
+if __name__ == "__main__":
+    main()
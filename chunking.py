@@ -0,0 +1,172 @@
+"""Token-aware splitting and map-reduce helpers for large requirements documents.
+
+Documents that would overflow the model's context are split on section
+boundaries into chunks that fit a token budget, either from a full string or
+lazily from a stream of text blocks. Each chunk is analysed on
+its own (the map step) and the per-chunk findings are merged and
+de-duplicated into one condensed requirements digest (the reduce step),
+which is small enough to feed to the regular analysis prompts.
+"""
+import json
+import re
+
+# Rough average for English prose with the GPT tokenizers
+CHARS_PER_TOKEN = 4
+
+# Lines that start a new section: markdown headings, numbered headings
+# such as "3.2 Login" or "REQ-12:", and short ALL-CAPS titles
+SECTION_HEADING = re.compile(
+    r"^(#{1,6}\s+\S"
+    r"|\d+(\.\d+)*\.?\s+[A-Z]"
+    r"|(?i:section|chapter|appendix)\s+[\dA-Z]"
+    r"|[A-Z]{2,}[-_ ]?\d+\s*[:.)-]"
+    r"|[A-Z][A-Z0-9 &/,-]{3,60}$)"
+)
+
+FINDING_KEYS = ("functional", "non_functional", "ambiguities", "test_cases")
+
+
+def estimate_tokens(text):
+    """Cheap token estimate used to size chunks"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_sections(text):
+    """Split text into sections, starting a new one at every heading line"""
+    sections = []
+    current = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped and current and SECTION_HEADING.match(stripped) and len(stripped) < 120:
+            sections.append("\n".join(current).strip())
+            current = []
+        current.append(line)
+    if current:
+        sections.append("\n".join(current).strip())
+    return [section for section in sections if section]
+
+
+def _split_oversized(section, max_tokens):
+    """Break a section bigger than the budget on paragraphs, then lines, then characters"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    for separator in ("\n\n", "\n"):
+        pieces = [piece for piece in section.split(separator) if piece.strip()]
+        if len(pieces) > 1:
+            return _pack(pieces, max_tokens, separator)
+    return [section[i:i + max_chars] for i in range(0, len(section), max_chars)]
+
+
+def _pack(pieces, max_tokens, separator):
+    """Greedily pack pieces into chunks that stay within max_tokens"""
+    chunks = []
+    current = []
+    current_tokens = 0
+    for piece in pieces:
+        piece_tokens = estimate_tokens(piece)
+        if piece_tokens > max_tokens:
+            if current:
+                chunks.append(separator.join(current))
+                current, current_tokens = [], 0
+            chunks.extend(_split_oversized(piece, max_tokens))
+            continue
+        if current and current_tokens + piece_tokens > max_tokens:
+            chunks.append(separator.join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += piece_tokens
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+
+def chunk_stream(blocks, max_tokens):
+    """Lazily pack a stream of text blocks into section-aligned chunks of at most max_tokens"""
+    current = []
+    current_tokens = 0
+    for block in blocks:
+        for section in split_sections(block):
+            pieces = [section]
+            if estimate_tokens(section) > max_tokens:
+                pieces = _split_oversized(section, max_tokens)
+            for piece in pieces:
+                piece_tokens = estimate_tokens(piece)
+                if current and current_tokens + piece_tokens > max_tokens:
+                    yield "\n\n".join(current)
+                    current, current_tokens = [], 0
+                current.append(piece)
+                current_tokens += piece_tokens
+    if current:
+        yield "\n\n".join(current)
+
+
+def chunk_document(text, max_tokens):
+    """Split a document into section-aligned chunks of at most max_tokens"""
+    return list(chunk_stream([text], max_tokens))
+
+
+def parse_findings(response):
+    """Parse a map-step response into lists of findings keyed by FINDING_KEYS"""
+    findings = {key: [] for key in FINDING_KEYS}
+    if not response:
+        return findings
+    # Models often wrap JSON in a ```json fence
+    match = re.search(r"\{.*\}", response, re.DOTALL)
+    try:
+        data = json.loads(match.group(0)) if match else None
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        # Keep the raw bullet lines rather than losing the chunk
+        findings["functional"] = [line.strip("-*• \t") for line in response.splitlines() if line.strip("-*• \t")]
+        return findings
+    for key in FINDING_KEYS:
+        items = data.get(key) or []
+        if isinstance(items, str):
+            items = [items]
+        findings[key] = [str(item).strip() for item in items if str(item).strip()]
+    return findings
+
+
+def _normalize(item):
+    return re.sub(r"[^a-z0-9]+", " ", item.lower()).strip()
+
+
+def merge_findings(findings_list):
+    """Reduce per-chunk findings into one list per key, dropping duplicates"""
+    merged = {key: [] for key in FINDING_KEYS}
+    seen = {key: set() for key in FINDING_KEYS}
+    for findings in findings_list:
+        for key in FINDING_KEYS:
+            for item in findings.get(key, []):
+                normalized = _normalize(item)
+                if normalized and normalized not in seen[key]:
+                    seen[key].add(normalized)
+                    merged[key].append(item)
+    return merged
+
+
+def format_ranges(numbers):
+    """Compress numbers into ranges, e.g. [3, 4, 5, 9] -> "3-5, 9" """
+    ranges = []
+    for number in sorted(numbers):
+        if ranges and number == ranges[-1][1] + 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return ", ".join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+
+def format_digest(merged):
+    """Render merged findings as a condensed requirements document"""
+    titles = {
+        "functional": "Functional Requirements",
+        "non_functional": "Non-Functional Requirements",
+        "ambiguities": "Ambiguities & Open Questions",
+        "test_cases": "Candidate Test Cases",
+    }
+    blocks = []
+    for key in FINDING_KEYS:
+        if merged[key]:
+            lines = "\n".join(f"- {item}" for item in merged[key])
+            blocks.append(f"{titles[key]}:\n{lines}")
+    return "\n\n".join(blocks)
@@ -0,0 +1,252 @@
+"""Reference content for the Professional Templates and Legal Resources tabs.
+
+Checklists, frameworks and resource lists live in content/library.yaml
+instead of as HTML strings inside app.py. Each library has a picker over
+categories. A category holds either cards, optionally laid out in columns,
+or a second picker over options that each hold cards. A ``card_template``
+with ``{option}`` and per-option ``fields`` is expanded into one card per
+option when the file is loaded, so rendering a selection is a lookup and a
+markdown call.
+
+Every category or option with cards becomes an Entry, indexed by the visa
+codes in its ``visa_types``, by (library, category) and by each lowercased
+``keywords`` item. The indexes are built with the libraries, so
+related_entries() for a visa code and case type is a few dict lookups.
+
+One ContentStore per process holds the parsed file. It is parsed on first
+access, not on import, and re-parsed only when the file's mtime or size has
+changed, checked at most every CONTENT_RELOAD_SECONDS. Edits are therefore
+picked up without a restart or deploy. A file that fails to parse or
+validate leaves the last good content in place and its error is shown above
+the pickers. Picker choices are kept in session state under
+PICKER_KEY_PREFIX keys, and keep_picker_state() carries them over reruns
+that skip the tabs.
+"""
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+import streamlit as st
+import yaml
+
+from visa_categories import VISA_BY_CODE
+
+CONTENT_PATH = os.getenv(
+    "CONTENT_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "content", "library.yaml")
+)
+# Seconds between checks of the content file for edits; 0 checks on every access
+CONTENT_RELOAD_SECONDS = float(os.getenv("CONTENT_RELOAD_SECONDS", "2"))
+
+PICKER_KEY_PREFIX = "library_picker:"
+
+# The C loader parses the file several times faster when libyaml is available
+_Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+logger = logging.getLogger(__name__)
+
+Library = namedtuple("Library", ["name", "picker", "categories"])
+Category = namedtuple("Category", ["name", "picker", "options", "cards", "columns", "visa_types", "keywords"])
+Option = namedtuple("Option", ["name", "cards", "visa_types", "keywords"])
+# A category or option with cards, as listed in the indexes
+Entry = namedtuple("Entry", ["library", "category", "option", "title", "cards", "columns", "visa_types", "keywords"])
+Content = namedtuple("Content", ["libraries", "entries", "by_visa_type", "by_category", "by_keyword"])
+
+
+def _cards(raw, where):
+    if not isinstance(raw, list) or not all(isinstance(card, str) for card in raw):
+        raise ValueError(f"Content for {where} must list cards as strings")
+    return tuple(card.strip() for card in raw)
+
+
+def _expand(template, fields):
+    """Fill a card_template, dropping lines that held only an empty field"""
+    lines = template.splitlines()
+    filled = [line.format_map(fields) for line in lines]
+    return "\n".join(out for line, out in zip(lines, filled) if out.strip() or not line.strip()).strip()
+
+
+def _tags(raw, where):
+    """The visa_types and keywords of a category or option, validated"""
+    visa_types = tuple(raw.get("visa_types", ()))
+    unknown = [code for code in visa_types if code not in VISA_BY_CODE]
+    if unknown:
+        raise ValueError(f"Content for {where} lists unknown visa types {unknown}; use codes from visa_categories.py")
+    return visa_types, tuple(str(keyword) for keyword in raw.get("keywords", ()))
+
+
+def _category(raw, library):
+    name = raw["name"]
+    where = f"{library} / {name}"
+    options = {}
+    for option in raw.get("options", ()):
+        if "card_template" in raw:
+            fields = defaultdict(str, option.get("fields", {}), option=option["name"])
+            cards = (_expand(raw["card_template"], fields),)
+        else:
+            cards = _cards(option.get("cards", []), f"{where} / {option['name']}")
+        options[option["name"]] = Option(option["name"], cards, *_tags(option, f"{where} / {option['name']}"))
+    if options and not raw.get("picker"):
+        raise ValueError(f"Content for {where} has options but no picker label")
+    return Category(name, raw.get("picker"), options, _cards(raw.get("cards", []), where),
+                    int(raw.get("columns", 1)), *_tags(raw, where))
+
+
+def load_libraries(path=CONTENT_PATH):
+    """Parse the content file into Library tuples by name"""
+    with open(path, encoding="utf-8") as f:
+        data = yaml.load(f, Loader=_Loader)
+    if not isinstance(data, dict):
+        raise ValueError(f"{path} must map library names to libraries")
+    libraries = {}
+    for name, raw in data.items():
+        categories = {category["name"]: _category(category, name) for category in raw["categories"]}
+        libraries[name] = Library(name, raw["picker"], categories)
+    return libraries
+
+
+def index_libraries(libraries):
+    """Content for the libraries, with their entries indexed by visa type, category and keyword"""
+    entries = []
+    for library in libraries.values():
+        for category in library.categories.values():
+            if category.cards:
+                entries.append(Entry(library.name, category.name, None, category.name, category.cards,
+                                     category.columns, category.visa_types, category.keywords))
+            for option in category.options.values():
+                if option.cards:
+                    entries.append(Entry(library.name, category.name, option.name, f"{category.name} / {option.name}",
+                                         option.cards, 1, option.visa_types, option.keywords))
+    by_visa_type, by_category, by_keyword = defaultdict(list), defaultdict(list), defaultdict(list)
+    for entry in entries:
+        by_category[entry.library, entry.category].append(entry)
+        for code in entry.visa_types:
+            by_visa_type[code].append(entry)
+        for keyword in entry.keywords:
+            by_keyword[keyword.lower()].append(entry)
+
+    def frozen(index):
+        return {key: tuple(found) for key, found in index.items()}
+
+    return Content(libraries, tuple(entries), frozen(by_visa_type), frozen(by_category), frozen(by_keyword))
+
+
+def load_content(path=CONTENT_PATH):
+    """Parse and index the content file"""
+    return index_libraries(load_libraries(path))
+
+
+class ContentStore:
+    """The content file, parsed once and re-parsed when it changes on disk"""
+
+    def __init__(self, path=CONTENT_PATH, reload_seconds=CONTENT_RELOAD_SECONDS):
+        self.path = path
+        self.reload_seconds = reload_seconds
+        self.version = 0
+        self.error = None
+        self._content = None
+        self._stamp = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def _file_stamp(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self):
+        """The current Content, reloading it first if the file has changed"""
+        if self._content is not None and time.monotonic() - self._checked < self.reload_seconds:
+            return self._content
+        with self._lock:
+            now = time.monotonic()
+            if self._content is not None and now - self._checked < self.reload_seconds:
+                return self._content
+            self._checked = now
+            try:
+                stamp = self._file_stamp()
+                if stamp != self._stamp:
+                    # Recorded before parsing so a broken file is reported once, not re-parsed every check
+                    self._stamp = stamp
+                    content = load_content(self.path)
+                    self._content, self.error = content, None
+                    self.version += 1
+                    if self.version > 1:
+                        logger.info("Reloaded %s (version %d)", self.path, self.version)
+            except (OSError, yaml.YAMLError, KeyError, TypeError, ValueError) as e:
+                if self._content is None:
+                    raise
+                self.error = f"{type(e).__name__}: {e}"
+                logger.warning("Keeping the previous content; could not reload %s: %s", self.path, self.error)
+            return self._content
+
+
+@st.cache_resource(show_spinner=False)
+def get_content_store():
+    """Process-wide content store, loaded on first use"""
+    return ContentStore()
+
+
+def get_library(name):
+    """Return a content library by name"""
+    try:
+        return get_content_store().get().libraries[name]
+    except KeyError:
+        raise KeyError(f"Unknown content library {name!r}; expected a top-level key in {CONTENT_PATH}") from None
+
+
+def related_entries(visa_type=None, case_type=None):
+    """Entries tagged with the visa type, then those with the case type as a keyword, without repeats"""
+    content = get_content_store().get()
+    found = content.by_visa_type.get(visa_type, ()) + content.by_keyword.get((case_type or "").lower(), ())
+    return list(dict.fromkeys(found))
+
+
+def keep_picker_state():
+    """Keep library picker choices through reruns that don't render their widgets"""
+    for key in list(st.session_state):
+        if isinstance(key, str) and key.startswith(PICKER_KEY_PREFIX):
+            st.session_state[key] = st.session_state[key]
+
+
+def render_cards(cards, columns=1):
+    if columns > 1:
+        slots = st.columns(columns)
+        for index, card in enumerate(cards):
+            with slots[index % columns]:
+                st.markdown(card, unsafe_allow_html=True)
+        return
+    for card in cards:
+        st.markdown(card, unsafe_allow_html=True)
+
+
+def _picker(label, choices, key):
+    # A reload can remove the saved choice; fall back to the first one instead of failing
+    if key in st.session_state and st.session_state[key] not in choices:
+        del st.session_state[key]
+    return st.selectbox(label, choices, key=key)
+
+
+def show_library(name):
+    """Pickers for a library and the cards of the selected category or option"""
+    store = get_content_store()
+    library = get_library(name)
+    if store.error:
+        st.warning(f"Showing the last good content; {store.path} could not be reloaded. {store.error}")
+    category = library.categories[_picker(library.picker, list(library.categories), f"{PICKER_KEY_PREFIX}{name}")]
+    cards = category.cards
+    if category.options:
+        option = _picker(category.picker, list(category.options), f"{PICKER_KEY_PREFIX}{name}:{category.name}")
+        cards = category.options[option].cards
+    render_cards(cards, category.columns)
+
+
+def show_related_entries(visa_type, case_type):
+    """An expander with the checklists and frameworks indexed under a visa type or case type"""
+    entries = related_entries(visa_type, case_type)
+    if not entries:
+        return
+    with st.expander(f"📚 Related checklists & frameworks ({len(entries)})"):
+        titles = {entry.title: entry for entry in entries}
+        entry = titles[st.selectbox("Reference:", list(titles), key=f"related_content:{visa_type}:{case_type}")]
+        render_cards(entry.cards, entry.columns)
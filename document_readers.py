@@ -0,0 +1,255 @@
+"""Text extraction for uploaded requirements documents.
+
+Every format has a generator reader that yields the document lazily in
+blocks - PDF pages, batches of Word paragraphs, or batches of spreadsheet
+rows - so consumers such as the chunker and the preview can stop early and
+peak memory does not scale with the size of the file. Each block ends with a
+line break, so joining a stream reproduces the full text.
+
+PDF page extraction is CPU bound, so large files are split into contiguous
+page ranges that are extracted in a process pool, a bounded window of ranges
+ahead of the consumer, and yielded back in page order. The PDF is written to
+a temporary file once and tasks carry only its path and a page range, so a
+large upload is not pickled into every task. Small files are
+extracted serially, where pool start-up would cost more than it saves. This
+module deliberately has no Streamlit dependency so that pool workers can
+import it cheaply.
+"""
+import atexit
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from contextlib import suppress
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import PyPDF2
+
+# PDFs with fewer pages than this are extracted serially
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40"))
+PDF_MAX_WORKERS = int(os.getenv("PDF_MAX_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+# Paragraphs or spreadsheet rows per yielded block
+DOCX_BATCH_SIZE = 200
+EXCEL_BATCH_SIZE = 500
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Pool workers reuse the parsed PDF across the ranges of one document
+_worker_reader = (None, None)
+
+
+def _get_pool(max_workers):
+    """Lazily start the shared extraction pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the Streamlit server process is multi-threaded
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _read_bytes(file):
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    if hasattr(file, "seek"):
+        file.seek(0)
+    return file.read()
+
+
+def _open_pdf(path):
+    """PdfReader for a PDF file, reused while the file stays the same"""
+    global _worker_reader
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    cached_key, reader = _worker_reader
+    if cached_key != key:
+        reader = PyPDF2.PdfReader(path)
+        _worker_reader = (key, reader)
+    return reader
+
+
+def _extract_pages(reader, start, stop):
+    """Extract pages [start, stop) of an open PDF and time each one"""
+    pages = []
+    timings = []
+    for index in range(start, stop):
+        began = time.perf_counter()
+        pages.append(reader.pages[index].extract_text() or "")
+        timings.append(time.perf_counter() - began)
+    return pages, timings
+
+
+def _extract_page_range(path, start, stop):
+    """Extract pages [start, stop) of a PDF file and time each one; runs in a pool worker"""
+    return (start, *_extract_pages(_open_pdf(path), start, stop))
+
+
+def _page_ranges(page_count, parts):
+    """Split page_count pages into at most `parts` contiguous ranges"""
+    size = -(-page_count // parts)
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def iter_pdf_pages(file, stats=None, max_workers=PDF_MAX_WORKERS, min_parallel_pages=PDF_PARALLEL_MIN_PAGES):
+    """Yield the text of each PDF page in order, filling `stats` as pages are extracted"""
+    stats = {} if stats is None else stats
+    pdf_bytes = _read_bytes(file)
+    # Parsed once here for the page count, and reused by every page extracted in this process
+    reader = PyPDF2.PdfReader(BytesIO(pdf_bytes))
+    page_count = len(reader.pages)
+    began = time.perf_counter()
+    timings = []
+    parallel = page_count >= min_parallel_pages and max_workers > 1
+    stats.update(pages=page_count, mode="parallel" if parallel else "serial", workers=max_workers if parallel else 1)
+
+    if parallel:
+        # A few ranges per worker evens out pages that are slow to extract
+        ranges = deque(_page_ranges(page_count, max_workers * 3))
+        window = deque()
+        path = None
+        try:
+            pool = _get_pool(max_workers)
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+                path = f.name
+                f.write(pdf_bytes)
+        except OSError:
+            pool = None
+        try:
+            while ranges or window:
+                # Keep at most two ranges per worker in flight ahead of the consumer
+                while pool is not None and ranges and len(window) < max_workers * 2:
+                    start, stop = ranges.popleft()
+                    window.append((start, stop, pool.submit(_extract_page_range, path, start, stop)))
+                if window:
+                    start, stop, future = window.popleft()
+                    try:
+                        _, pages, range_timings = future.result()
+                    except BrokenProcessPool:
+                        _reset_pool()
+                        pool = None
+                        pages, range_timings = _extract_pages(reader, start, stop)
+                else:
+                    # The pool is unavailable; finish serially
+                    start, stop = ranges.popleft()
+                    pages, range_timings = _extract_pages(reader, start, stop)
+                timings.extend(range_timings)
+                for page in pages:
+                    yield page + "\n"
+        finally:
+            # Closed early, e.g. by a preview: workers must be done with the file before it goes
+            running = [future for _, _, future in window if not future.cancel()]
+            wait(running)
+            if path is not None:
+                with suppress(OSError):
+                    os.remove(path)
+    else:
+        for index in range(page_count):
+            page_began = time.perf_counter()
+            page = reader.pages[index].extract_text() or ""
+            timings.append(time.perf_counter() - page_began)
+            yield page + "\n"
+
+    slowest = max(range(len(timings)), key=timings.__getitem__) if timings else None
+    stats.update(
+        elapsed=time.perf_counter() - began,
+        page_seconds=timings,
+        mean_page_seconds=sum(timings) / len(timings) if timings else 0.0,
+        slowest_page=slowest + 1 if slowest is not None else None,
+        slowest_page_seconds=timings[slowest] if slowest is not None else 0.0,
+    )
+
+
+def extract_pdf_text(file, **options):
+    """Extract the whole PDF as one string, returning (text, stats)"""
+    stats = {}
+    text = "".join(iter_pdf_pages(file, stats, **options))
+    return text, stats
+
+
+def iter_docx_paragraphs(file, batch_size=DOCX_BATCH_SIZE):
+    """Yield a Word document's paragraphs in batches, one line per paragraph"""
+    # Imported here so PDF pool workers don't pay for it
+    from docx import Document
+
+    batch = []
+    for paragraph in Document(file).paragraphs:
+        batch.append(paragraph.text + "\n")
+        if len(batch) >= batch_size:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def _format_row(values):
+    return "\t".join("" if value is None else str(value) for value in values).rstrip("\t") + "\n"
+
+
+def iter_excel_rows(file, batch_size=EXCEL_BATCH_SIZE):
+    """Yield the first worksheet as batches of tab-separated rows"""
+    if getattr(file, "name", "").lower().endswith(".xls"):
+        # openpyxl cannot read legacy .xls, so pandas loads that sheet whole
+        import pandas as pd
+
+        df = pd.read_excel(file)
+        yield _format_row(df.columns)
+        for start in range(0, len(df), batch_size):
+            rows = df.iloc[start:start + batch_size].itertuples(index=False, name=None)
+            yield "".join(_format_row(row) for row in rows)
+        return
+
+    from openpyxl import load_workbook
+
+    # read_only streams rows from the XML instead of building every cell
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        batch = []
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            if any(value is not None for value in row):
+                batch.append(_format_row(row))
+            if len(batch) >= batch_size:
+                yield "".join(batch)
+                batch = []
+        if batch:
+            yield "".join(batch)
+    finally:
+        workbook.close()
+
+
+def iter_document(file, extension):
+    """Yield text blocks for a file with the given extension, or None if unsupported"""
+    readers = {
+        "pdf": iter_pdf_pages,
+        "xlsx": iter_excel_rows,
+        "xls": iter_excel_rows,
+        "docx": iter_docx_paragraphs,
+    }
+    reader = readers.get(extension)
+    return reader(file) if reader else None
+
+
+def take_text(blocks, limit):
+    """Read blocks until at least `limit` characters are collected, returning (text, exhausted)"""
+    collected = []
+    size = 0
+    for block in blocks:
+        collected.append(block)
+        size += len(block)
+        if size >= limit:
+            return "".join(collected), False
+    return "".join(collected), True
@@ -0,0 +1,317 @@
+"""Prompt handlers for immigration responses and the routing table in front of them.
+
+generate_comprehensive_immigration_response routes a (case type, visa
+category) pair to its handler through a dict built once, when this module is
+imported, rather than walking an if/elif chain on every call. Handlers
+register themselves with the @route decorator, either for specific visa
+codes or as the default for a case type, and every route is checked against
+the visa index at import so a typo fails on start-up instead of on a user's
+request. Prompt text lives in the versioned templates under prompts/ (see
+prompt_templates.py). A handler's name is also the task that llm_providers
+uses to pick its model, and the feature its calls are reported under in
+telemetry, tagged with the case type and visa category.
+"""
+import os
+import threading
+
+import streamlit as st
+
+from bulk_rfe import run_bulk_job
+from llm_cache import CACHE_DISABLED
+from llm_providers import LLMUnavailableError, complete_chat, complete_chat_async, llm_task, resolve_targets
+from prompt_templates import TEMPLATES, render_prompt
+from rate_limiter import PRIORITY_NORMAL, request_priority
+from telemetry import call_tags
+from visa_categories import VISA_BY_CODE, VISA_CODES_BY_SUBCATEGORY
+
+# Case types offered in the RFE & Immigration Matters tab
+CASE_TYPES = (
+    "RFE Response", "Initial Petition Strategy", "Motion to Reopen/Reconsider",
+    "BIA Appeal Brief", "Adjustment of Status", "Naturalization",
+    "Removal Defense", "Waiver Application", "General Immigration Guidance",
+)
+
+# UI labels that share a handler with a shorter case type
+CASE_TYPE_ALIASES = {
+    "Initial Petition Strategy": "Initial Petition",
+    "Motion to Reopen/Reconsider": "Motion",
+    "BIA Appeal Brief": "Appeal",
+}
+
+WORK_VISA_CODES = ("H-1B", "H-1B1", "E-3", "TN")
+L_VISA_CODES = ("L-1A", "L-1B")
+O_VISA_CODES = ("O-1A", "O-1B")
+IMMIGRANT_VISA_CODES = ("EB-1A", "EB-1B", "EB-1C", "EB-2", "EB-3")
+STUDENT_VISA_CODES = ("F-1", "M-1", "J-1")
+FAMILY_VISA_CODES = VISA_CODES_BY_SUBCATEGORY[("Immigrant Visas", "Family-Based")]
+
+# Expert letter type -> prompt template; other types use expert_general
+EXPERT_LETTER_TEMPLATES = {
+    "Position Expert Opinion": "expert_position",
+    "Beneficiary Qualifications Expert Opinion": "expert_beneficiary_qualifications",
+    "Extraordinary Ability Expert Opinion": "expert_extraordinary_ability",
+    "Country Conditions Expert Opinion": "expert_country_conditions",
+    "General Expert Opinion": "expert_general",
+}
+
+# Settings a background job carries over from the session that submitted it;
+# job threads have no session of their own
+_job_settings = threading.local()
+
+# (case_type, visa_code) -> handler, and case_type -> default handler
+ROUTES = {}
+DEFAULT_ROUTES = {}
+
+
+def route(case_type, visa_codes=None):
+    """Register a handler for a case type, limited to visa_codes or as its default"""
+    def register(handler):
+        keys = [(case_type, code) for code in visa_codes] if visa_codes is not None else [case_type]
+        table = ROUTES if visa_codes is not None else DEFAULT_ROUTES
+        for key in keys:
+            if key in table:
+                raise ValueError(f"Route {key} is already handled by {table[key].__name__}")
+            table[key] = handler
+        return handler
+    return register
+
+
+def resolve_handler(case_type, visa_category):
+    """Return the handler for a case type and visa code, or None for general guidance"""
+    case_type = CASE_TYPE_ALIASES.get(case_type, case_type)
+    return ROUTES.get((case_type, visa_category)) or DEFAULT_ROUTES.get(case_type)
+
+
+def _use_cache():
+    """Whether this call may reuse a cached response"""
+    bypass = getattr(_job_settings, 'bypass_cache', None)
+    if bypass is None:
+        bypass = st.session_state.get('bypass_cache', False)
+    return not (CACHE_DISABLED or bypass)
+
+
+def _get_secret(name):
+    """A Streamlit secret, or None when it is not set"""
+    try:
+        return st.secrets.get(name)
+    except FileNotFoundError:
+        # No secrets.toml, as when running from the command line
+        return None
+
+
+def _get_api_key():
+    """The configured OpenAI API key, or None after reporting the problem"""
+    api_key = _get_secret("OPENAI_API_KEY") or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        st.error("❌ OpenAI API key not found. Please configure your API key in Streamlit secrets.")
+        return None
+    
+    if not api_key.startswith('sk-'):
+        st.error("❌ Invalid API key format. Please check your configuration.")
+        return None
+    return api_key
+
+
+# Model used when no route in llm_providers names one for the task
+DEFAULT_MODEL = "gpt-4"
+
+
+def build_chat_request(prompt, max_tokens=2000, temperature=0.3):
+    """Chat-completions payload for an immigration prompt; the route fills in the model"""
+    return {
+        "model": DEFAULT_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": max_tokens,
+        "temperature": temperature
+    }
+
+
+def call_openai_api(prompt, max_tokens=2000, temperature=0.3, use_cache=None, stream=False, priority=None, task=None):
+    """Call the routed LLM for immigration law assistance, optionally streaming tokens into the page"""
+    if use_cache is None:
+        use_cache = _use_cache()
+    try:
+        api_key = _get_api_key()
+        if api_key is None:
+            return None
+        
+        data = build_chat_request(prompt, max_tokens, temperature)
+        return complete_chat(api_key, data, resolve_targets(task, DEFAULT_MODEL),
+                             use_cache=use_cache, stream=stream, priority=priority, task=task)
+    
+    except LLMUnavailableError as e:
+        st.error(f"API Error: {str(e)}")
+        return None
+    except Exception as e:
+        st.error(f"Error calling OpenAI API: {str(e)}")
+        return None
+
+
+async def call_openai_api_async(prompt, max_tokens=2000, temperature=0.3, use_cache=None, priority=None, task=None):
+    """Async call_openai_api with the same routing, cache, retries and rate limit; await it inside run_async()"""
+    if use_cache is None:
+        use_cache = _use_cache()
+    try:
+        api_key = _get_api_key()
+        if api_key is None:
+            return None
+        
+        data = build_chat_request(prompt, max_tokens, temperature)
+        return await complete_chat_async(api_key, data, resolve_targets(task, DEFAULT_MODEL),
+                                          use_cache=use_cache, priority=priority, task=task)
+    
+    except LLMUnavailableError as e:
+        st.error(f"API Error: {str(e)}")
+        return None
+    except Exception as e:
+        st.error(f"Error calling OpenAI API: {str(e)}")
+        return None
+
+
+def generate_comprehensive_immigration_response(case_type, visa_category, case_details, stream=False):
+    """Generate comprehensive immigration responses for any US visa type or immigration matter"""
+    handler = resolve_handler(case_type, visa_category)
+    with call_tags(case_type=case_type, visa_category=visa_category):
+        if handler is None:
+            return generate_general_immigration_guidance(case_type, visa_category, case_details, stream=stream)
+        # Each handler can be routed to its own model (see llm_providers.py)
+        with llm_task(handler.__name__):
+            return handler(visa_category, case_details, stream=stream)
+
+
+@route("RFE Response", WORK_VISA_CODES)
+def generate_work_visa_rfe_response(visa_category, case_details, stream=False):
+    """Generate RFE responses for work-based visas"""
+    prompt = render_prompt("rfe_work_visa", case_details, visa_category=visa_category)
+    return call_openai_api(prompt, max_tokens=3000, temperature=0.2, stream=stream)
+
+
+@route("RFE Response", L_VISA_CODES)
+def generate_l_visa_rfe_response(visa_category, case_details, stream=False):
+    """Generate RFE responses for L-1 intracompany transferee visas"""
+    prompt = render_prompt("rfe_l_visa", case_details, visa_category=visa_category)
+    return call_openai_api(prompt, max_tokens=3000, temperature=0.2, stream=stream)
+
+
+@route("RFE Response", O_VISA_CODES)
+def generate_o_visa_rfe_response(visa_category, case_details, stream=False):
+    """Generate RFE responses for O-1 extraordinary ability visas"""
+    prompt = render_prompt("rfe_o_visa", case_details, visa_category=visa_category)
+    return call_openai_api(prompt, max_tokens=3000, temperature=0.2, stream=stream)
+
+
+@route("RFE Response", IMMIGRANT_VISA_CODES)
+def generate_immigrant_visa_rfe_response(visa_category, case_details, stream=False):
+    """Generate RFE responses for employment-based immigrant visas"""
+    prompt = render_prompt("rfe_immigrant_visa", case_details, visa_category=visa_category)
+    return call_openai_api(prompt, max_tokens=3000, temperature=0.2, stream=stream)
+
+
+@route("RFE Response", FAMILY_VISA_CODES)
+def generate_family_visa_rfe_response(visa_category, case_details, stream=False):
+    """Generate RFE responses for family-based immigration cases"""
+    prompt = render_prompt("rfe_family_visa", case_details, visa_category=visa_category)
+    return call_openai_api(prompt, max_tokens=3000, temperature=0.2, stream=stream)
+
+
+def generate_general_immigration_guidance(case_type, visa_category, case_details, stream=False):
+    """Generate general immigration guidance for any type of case"""
+    prompt = render_prompt(
+        "general_guidance",
+        case_details,
+        case_type=case_type,
+        visa_category=visa_category,
+        question=case_details.get('question', case_details.get('issue', 'Not specified')),
+    )
+    # Also called directly by the Legal Research Chat, outside the dispatcher
+    return call_openai_api(prompt, max_tokens=3000, temperature=0.2, stream=stream,
+                           task="generate_general_immigration_guidance")
+
+
+def generate_expert_opinion_letter(letter_type, case_details, stream=False):
+    """Generate expert opinion letter for immigration cases"""
+    template = EXPERT_LETTER_TEMPLATES.get(letter_type, "expert_general")
+    prompt = render_prompt(template, case_details)
+    with call_tags(case_type=letter_type):
+        return call_openai_api(prompt, max_tokens=2500, temperature=0.2, stream=stream,
+                               task="generate_expert_opinion_letter")
+
+
+@route("RFE Response", STUDENT_VISA_CODES)
+def generate_student_visa_rfe_response(visa_category, case_details, stream=False):
+    """Generate RFE responses for student and exchange visitor cases"""
+    prompt = render_prompt("rfe_student_visa", case_details, visa_category=visa_category)
+    return call_openai_api(prompt, max_tokens=3000, temperature=0.2, stream=stream)
+
+
+@route("RFE Response")
+def generate_general_rfe_response(visa_category, case_details, stream=False):
+    """Generate RFE responses for visa categories without a dedicated handler"""
+    prompt = render_prompt("rfe_general", case_details, visa_category=visa_category)
+    return call_openai_api(prompt, max_tokens=3000, temperature=0.2, stream=stream)
+
+
+@route("Initial Petition")
+def generate_initial_petition_guidance(visa_category, case_details, stream=False):
+    """Generate filing strategy for an initial petition or application"""
+    prompt = render_prompt("initial_petition", case_details, visa_category=visa_category)
+    return call_openai_api(prompt, max_tokens=3000, temperature=0.2, stream=stream)
+
+
+@route("Motion")
+def generate_motion_response(visa_category, case_details, stream=False):
+    """Generate a motion to reopen or reconsider"""
+    prompt = render_prompt("motion", case_details, visa_category=visa_category)
+    return call_openai_api(prompt, max_tokens=3000, temperature=0.2, stream=stream)
+
+
+@route("Appeal")
+def generate_appeal_brief(visa_category, case_details, stream=False):
+    """Generate a BIA or AAO appeal brief"""
+    prompt = render_prompt("appeal_brief", case_details, visa_category=visa_category)
+    return call_openai_api(prompt, max_tokens=3000, temperature=0.2, stream=stream)
+
+
+def _validate_routes():
+    """Fail at import if a route names an unknown visa code or case type"""
+    problems = [f"unknown visa code {code!r} for {case_type!r}" for case_type, code in ROUTES if code not in VISA_BY_CODE]
+    problems += [f"alias {alias!r} points at {target!r}, which has no handler"
+                 for alias, target in CASE_TYPE_ALIASES.items() if target not in DEFAULT_ROUTES]
+    problems += [f"handler for {key!r} is not callable" for key, handler in {**ROUTES, **DEFAULT_ROUTES}.items()
+                 if not callable(handler)]
+    problems += [f"expert letter {letter_type!r} uses missing prompt {name!r}"
+                 for letter_type, name in EXPERT_LETTER_TEMPLATES.items() if name not in TEMPLATES]
+    if problems:
+        raise ValueError("Invalid immigration response routes: " + "; ".join(problems))
+
+
+_validate_routes()
+
+
+def _run_job(generate, params, *args, stream=False):
+    _job_settings.bypass_cache = params.get("bypass_cache")
+    try:
+        # Queued work yields to requests someone is watching
+        with request_priority(params.get("priority", PRIORITY_NORMAL)):
+            return generate(*args, stream=stream)
+    finally:
+        _job_settings.bypass_cache = None
+
+
+def run_immigration_response_job(params, stream=False):
+    """Job handler for generate_comprehensive_immigration_response"""
+    return _run_job(generate_comprehensive_immigration_response, params,
+                    params["case_type"], params["visa_category"], params["case_details"], stream=stream)
+
+
+def run_expert_letter_job(params, stream=False):
+    """Job handler for generate_expert_opinion_letter"""
+    return _run_job(generate_expert_opinion_letter, params, params["letter_type"], params["case_details"], stream=stream)
+
+
+# Job kind -> handler taking the job's params, used by job_queue
+JOB_HANDLERS = {
+    "immigration_response": run_immigration_response_job,
+    "expert_letter": run_expert_letter_job,
+    "bulk_cases": run_bulk_job,
+}
@@ -0,0 +1,176 @@
+"""Background jobs for long generations, persisted in SQLite.
+
+A Streamlit rerun abandons whatever the script thread was waiting on, so a
+widget click during a 3000-token call wastes the request. Instead, forms
+submit a job: a row in the jobs table plus a task on a process-wide worker
+pool that runs independently of any script run. Pages poll the table for
+status and pick the result up when it is ready. Jobs that were queued or
+running when the process stopped are queued again on start-up, which
+assumes one server process per jobs database.
+
+Workers have no script context, so handlers must not rely on the page:
+st.error calls inside them are dropped and any failure surfaces as the
+job's error.
+"""
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+from sqlalchemy import Column, Float, Index, MetaData, String, Table, Text, create_engine, func, select, update
+
+from llm_cache import CACHE_DIR
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(CACHE_DIR, "jobs.sqlite3"))
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", "3"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+
+class JobQueue:
+    """Thread pool that runs registered job kinds and records them in a SQLite table"""
+
+    def __init__(self, handlers, path=JOBS_DB_PATH, max_workers=JOB_MAX_WORKERS):
+        self.handlers = dict(handlers)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.engine = create_engine(f"sqlite:///{path}")
+        metadata = MetaData()
+        self.table = Table(
+            "jobs", metadata,
+            Column("id", String(32), primary_key=True),
+            Column("kind", String(64), nullable=False),
+            Column("label", Text, nullable=False),
+            Column("owner", String(64), index=True),
+            Column("params", Text, nullable=False),
+            Column("status", String(16), nullable=False, index=True),
+            Column("result", Text),
+            Column("error", Text),
+            Column("created_at", Float, nullable=False),
+            Column("started_at", Float),
+            Column("finished_at", Float),
+            # Covers succeeded_since() and succeeded_ids() without reading the result text
+            Index("ix_jobs_status_finished_at", "status", "finished_at", "id"),
+        )
+        metadata.create_all(self.engine)
+        # create_all skips tables that already exist, so add indexes new since a database was made
+        for index in self.table.indexes:
+            index.create(self.engine, checkfirst=True)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._resume()
+
+    def _resume(self):
+        """Queue again the jobs a previous process left unfinished"""
+        table = self.table
+        with self.engine.begin() as conn:
+            rows = conn.execute(select(table.c.id).where(table.c.status.in_(ACTIVE_STATUSES))
+                                .order_by(table.c.created_at)).all()
+            conn.execute(update(table).where(table.c.status == RUNNING).values(status=QUEUED, started_at=None))
+        for row in rows:
+            self.executor.submit(self._run, row.id)
+
+    def submit(self, kind, params, label="", owner=None):
+        """Record a job and queue it, returning its id"""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind {kind!r}")
+        job_id = uuid.uuid4().hex
+        with self.engine.begin() as conn:
+            conn.execute(self.table.insert().values(
+                id=job_id,
+                kind=kind,
+                label=label or kind,
+                owner=owner,
+                params=json.dumps(params, ensure_ascii=False, default=str),
+                status=QUEUED,
+                created_at=time.time(),
+            ))
+        self.executor.submit(self._run, job_id)
+        return job_id
+
+    def _claim(self, job_id):
+        """Mark a queued job running and return its row, or None if another worker already has it"""
+        table = self.table
+        with self._lock, self.engine.begin() as conn:
+            claimed = conn.execute(update(table).where(table.c.id == job_id, table.c.status == QUEUED)
+                                   .values(status=RUNNING, started_at=time.time())).rowcount
+            row = conn.execute(select(table.c.kind, table.c.params).where(table.c.id == job_id)).first()
+        return row if claimed else None
+
+    def _run(self, job_id):
+        row = self._claim(job_id)
+        if row is None:
+            return
+        result, error = None, None
+        try:
+            result = self.handlers[row.kind](json.loads(row.params))
+            if not result:
+                error = "No response from the API"
+        except Exception as e:
+            error = f"{e}\n{traceback.format_exc(limit=3)}"
+        with self.engine.begin() as conn:
+            conn.execute(update(self.table).where(self.table.c.id == job_id).values(
+                status=FAILED if error else SUCCEEDED,
+                result=result if not error else None,
+                error=error,
+                finished_at=time.time(),
+            ))
+
+    def get(self, job_id):
+        """Return a job as a dict, or None"""
+        with self.engine.connect() as conn:
+            row = conn.execute(select(self.table).where(self.table.c.id == job_id)).first()
+        return dict(row._mapping) if row else None
+
+    def list_jobs(self, owner=None, limit=20):
+        """Most recent jobs first, optionally for one owner"""
+        query = select(self.table).order_by(self.table.c.created_at.desc()).limit(limit)
+        if owner is not None:
+            query = query.where(self.table.c.owner == owner)
+        with self.engine.connect() as conn:
+            return [dict(row._mapping) for row in conn.execute(query)]
+
+    def has_active(self, owner=None):
+        """Whether any job, optionally of one owner, is queued or running"""
+        query = select(self.table.c.id).where(self.table.c.status.in_(ACTIVE_STATUSES)).limit(1)
+        if owner is not None:
+            query = query.where(self.table.c.owner == owner)
+        with self.engine.connect() as conn:
+            return conn.execute(query).first() is not None
+
+    def succeeded_since(self, since=0.0):
+        """Id, label, owner, result and finish time of jobs that succeeded at or after `since`, oldest first"""
+        table = self.table
+        query = (select(table.c.id, table.c.label, table.c.owner, table.c.result, table.c.finished_at)
+                 .where(table.c.status == SUCCEEDED, table.c.finished_at >= since).order_by(table.c.finished_at))
+        with self.engine.connect() as conn:
+            return [dict(row._mapping) for row in conn.execute(query)]
+
+    def count(self, status):
+        """Number of jobs with a status"""
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(self.table).where(self.table.c.status == status)).scalar()
+
+    def succeeded_ids(self):
+        """Ids of every succeeded job still in the table"""
+        with self.engine.connect() as conn:
+            return set(conn.execute(select(self.table.c.id).where(self.table.c.status == SUCCEEDED)).scalars())
+
+    def forget(self, job_id):
+        """Delete a finished job"""
+        table = self.table
+        with self.engine.begin() as conn:
+            conn.execute(table.delete().where(table.c.id == job_id, table.c.status.not_in(ACTIVE_STATUSES)))
+
+
+@st.cache_resource(show_spinner=False)
+def get_job_queue():
+    """Process-wide job queue for immigration document generation"""
+    from immigration_responses import JOB_HANDLERS
+
+    return JobQueue(JOB_HANDLERS)
@@ -0,0 +1,187 @@
+"""Content-addressed cache for LLM responses.
+
+Responses are keyed by a SHA-256 of the request parameters that determine
+the output (model, prompt, max_tokens, temperature). Lookups go through an
+in-memory LRU tier first and fall back to an on-disk SQLite tier, so
+identical prompts are answered without another paid API call, even after
+the app restarts. Both tiers expire entries after a TTL and evict the least
+recently used entries once they grow past their size limits.
+
+TieredCache itself is content-agnostic and also backs other caches, such as
+the extracted-text cache for uploaded documents.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, Text, create_engine, delete, func, select, update
+
+CACHE_DIR = os.getenv("LLM_CACHE_DIR", ".cache")
+CACHE_DISABLED = os.getenv("LLM_CACHE_DISABLED", "false").lower() in ("1", "true", "yes")
+CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+MEMORY_MAX_ITEMS = int(os.getenv("LLM_CACHE_MEMORY_ITEMS", "256"))
+MEMORY_MAX_BYTES = int(os.getenv("LLM_CACHE_MEMORY_MB", "64")) * 1024 * 1024
+DISK_MAX_BYTES = int(os.getenv("LLM_CACHE_DISK_MB", "200")) * 1024 * 1024
+
+
+def make_cache_key(*parts):
+    """Hash JSON-serialisable parts into a stable cache key"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def response_cache_key(data):
+    """Cache key for a chat-completions payload"""
+    prompt = "\n".join(message["content"] for message in data["messages"])
+    return make_cache_key(data["model"], prompt, data.get("max_tokens"), data.get("temperature"))
+
+
+class MemoryLRU:
+    """Thread-safe in-memory LRU tier with per-entry expiry, bounded by items and characters"""
+
+    def __init__(self, max_items=MEMORY_MAX_ITEMS, max_bytes=MEMORY_MAX_BYTES):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at and expires_at < time.time():
+                del self._items[key]
+                self._size -= len(value)
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous[0])
+            self._items[key] = (value, time.time() + ttl if ttl else None)
+            self._size += len(value)
+            while self._items and (len(self._items) > self.max_items or self._size > self.max_bytes):
+                _, (evicted, _) = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+
+class SQLiteTier:
+    """On-disk tier stored in a SQLite table, bounded by total payload bytes"""
+
+    def __init__(self, path, table_name, max_bytes=DISK_MAX_BYTES):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_bytes = max_bytes
+        self.engine = create_engine(f"sqlite:///{path}")
+        metadata = MetaData()
+        self.table = Table(
+            table_name, metadata,
+            Column("key", String(64), primary_key=True),
+            Column("value", Text, nullable=False),
+            Column("size", Integer, nullable=False),
+            Column("created_at", Float, nullable=False),
+            Column("expires_at", Float),
+            Column("last_access", Float, nullable=False, index=True),
+        )
+        metadata.create_all(self.engine)
+
+    def get(self, key):
+        now = time.time()
+        table = self.table
+        with self.engine.begin() as conn:
+            row = conn.execute(select(table.c.value, table.c.expires_at).where(table.c.key == key)).first()
+            if row is None:
+                return None
+            if row.expires_at and row.expires_at < now:
+                conn.execute(delete(table).where(table.c.key == key))
+                return None
+            conn.execute(update(table).where(table.c.key == key).values(last_access=now))
+            return row.value
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        table = self.table
+        with self.engine.begin() as conn:
+            conn.execute(delete(table).where(table.c.key == key))
+            conn.execute(table.insert().values(
+                key=key,
+                value=value,
+                size=len(value.encode("utf-8")),
+                created_at=now,
+                expires_at=now + ttl if ttl else None,
+                last_access=now,
+            ))
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        """Drop expired rows, then least recently used rows until under max_bytes"""
+        table = self.table
+        conn.execute(delete(table).where(table.c.expires_at.is_not(None), table.c.expires_at < now))
+        total = conn.execute(select(func.coalesce(func.sum(table.c.size), 0))).scalar()
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute(select(table.c.key, table.c.size).order_by(table.c.last_access)).all()
+        stale = []
+        for row in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append(row.key)
+            total -= row.size
+        conn.execute(delete(table).where(table.c.key.in_(stale)))
+
+    def clear(self):
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table))
+
+
+class TieredCache:
+    """Memory LRU in front of a SQLite table, with hit/miss counters"""
+
+    def __init__(self, name, ttl=CACHE_TTL, memory_items=MEMORY_MAX_ITEMS, memory_bytes=MEMORY_MAX_BYTES,
+                 disk_bytes=DISK_MAX_BYTES, cache_dir=CACHE_DIR):
+        self.ttl = ttl
+        self.memory = MemoryLRU(memory_items, memory_bytes)
+        self.disk = SQLiteTier(os.path.join(cache_dir, f"{name}.sqlite3"), name, disk_bytes)
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            self.stats["memory_hits"] += 1
+            return value
+        value = self.disk.get(key)
+        if value is not None:
+            self.stats["disk_hits"] += 1
+            self.memory.set(key, value, self.ttl)
+            return value
+        self.stats["misses"] += 1
+        return None
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self.memory.set(key, value, ttl)
+        self.disk.set(key, value, ttl)
+
+    def clear(self):
+        self.memory.clear()
+        self.disk.clear()
+
+
+@st.cache_resource(show_spinner=False)
+def get_response_cache():
+    """Process-wide cache of LLM responses"""
+    return TieredCache("llm_responses")
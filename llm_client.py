@@ -0,0 +1,149 @@
+"""Shared HTTP client for the OpenAI chat-completions API.
+
+Both Streamlit apps send every request through one pooled, keep-alive
+``requests.Session`` per API key. The session lives in Streamlit's resource
+cache, so it survives script reruns and TCP/TLS connections to the API host
+are reused instead of being re-established on every call.
+
+Long generations can be streamed: the server-sent event stream is decoded
+into content deltas and rendered incrementally while the full text is
+assembled for the caller.
+
+Every request first takes a lease from the process-wide RateLimiter (see
+rate_limiter.py), which paces requests and tokens per minute to the account
+limits and caps concurrent requests.
+
+Timeouts, dropped connections, 429s and 5xx responses are retried by the
+process-wide RetryPolicy (see retry_policy.py), within a per-call deadline
+and behind a circuit breaker. Each attempt takes its own lease. A stream is
+only retried until its first byte arrives, because tokens already shown on
+the page cannot be taken back.
+"""
+import json
+import os
+import time
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import RateLimiter, estimate_request_tokens
+from retry_policy import RetryPolicy, retry_after_seconds
+
+# Point at any OpenAI-compatible server, e.g. benchmarks/mock_openai_server.py
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+OPENAI_CHAT_URL = f"{OPENAI_BASE_URL}/chat/completions"
+
+# Connection pool tuning, overridable from the environment
+POOL_SIZE = int(os.getenv("OPENAI_POOL_SIZE", "10"))
+KEEP_ALIVE = os.getenv("OPENAI_KEEP_ALIVE", "true").lower() not in ("0", "false", "no")
+
+
+@st.cache_resource(show_spinner=False)
+def get_http_session(api_key, pool_size=POOL_SIZE, keep_alive=KEEP_ALIVE):
+    """Create the process-wide pooled session for an API key"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "Connection": "keep-alive" if keep_alive else "close",
+    })
+    return session
+
+
+@st.cache_resource(show_spinner=False)
+def get_rate_limiter():
+    """Process-wide limiter shared by every OpenAI request"""
+    return RateLimiter()
+
+
+@st.cache_resource(show_spinner=False)
+def get_retry_policy():
+    """Process-wide retry policy, circuit breaker and retry metrics"""
+    return RetryPolicy()
+
+
+def _send(api_key, data, timeout, priority, remaining, stream=False, url=OPENAI_CHAT_URL, limiter=None):
+    """Send one attempt within the rate limit, giving up once the call's deadline has passed"""
+    limiter = limiter or get_rate_limiter()
+    lease = limiter.acquire(estimate_request_tokens(data), priority=priority, timeout=max(0.0, remaining))
+    try:
+        # Wait no longer than what is left of the call's budget
+        response = get_http_session(api_key).post(url, json=data, stream=stream,
+                                                  timeout=max(1.0, min(timeout, remaining)))
+    except Exception:
+        lease.release()
+        raise
+    if stream and response.status_code == 200:
+        # The request stays in flight until iter_stream_content has drained the body
+        response.rate_limit_lease = lease
+        return response
+    if stream:
+        # Error bodies are short; read it now so the caller's response.text still works
+        response.content
+    lease.release()
+    if response.status_code == 429:
+        limiter.pause(retry_after_seconds(response) or 1.0)
+    return response
+
+
+def post_chat_completion(api_key, data, timeout=60, priority=None, deadline=None,
+                         url=OPENAI_CHAT_URL, limiter=None, retry_policy=None):
+    """POST a chat-completions payload over the shared session, within the rate limit, retrying transient failures
+
+    `url`, `limiter` and `retry_policy` default to OpenAI's; other
+    OpenAI-compatible endpoints pass their own (see llm_providers.py).
+    """
+    return (retry_policy or get_retry_policy()).run(
+        lambda remaining: _send(api_key, data, timeout, priority, remaining, url=url, limiter=limiter),
+        deadline=deadline)
+
+
+def stream_chat_completion(api_key, data, timeout=60, priority=None, deadline=None,
+                           url=OPENAI_CHAT_URL, limiter=None, retry_policy=None):
+    """POST a streaming chat-completions payload and return the open response"""
+    payload = dict(data, stream=True)
+    return (retry_policy or get_retry_policy()).run(
+        lambda remaining: _send(api_key, payload, timeout, priority, remaining, stream=True, url=url, limiter=limiter),
+        deadline=deadline)
+
+
+def iter_stream_content(response):
+    """Yield content deltas from a chat-completions SSE response"""
+    # text/event-stream has no charset, so requests would guess latin-1
+    response.encoding = "utf-8"
+    try:
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            chunk = line[len("data:"):].strip()
+            if chunk == "[DONE]":
+                break
+            choices = json.loads(chunk).get("choices") or [{}]
+            content = choices[0].get("delta", {}).get("content")
+            if content:
+                yield content
+    finally:
+        response.close()
+        lease = getattr(response, "rate_limit_lease", None)
+        if lease is not None:
+            lease.release()
+
+
+def render_token_stream(tokens, refresh_interval=0.05):
+    """Render tokens into a placeholder as they arrive and return the full text"""
+    placeholder = st.empty()
+    parts = []
+    last_render = 0.0
+    for token in tokens:
+        parts.append(token)
+        now = time.monotonic()
+        if now - last_render >= refresh_interval:
+            placeholder.markdown("".join(parts) + " ▌")
+            last_render = now
+    # Callers render the finished text themselves
+    placeholder.empty()
+    return "".join(parts)
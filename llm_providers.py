@@ -0,0 +1,265 @@
+"""LLM providers, per-task model routing and fallback.
+
+A provider is an OpenAI-compatible chat-completions endpoint with its own
+rate limiter and retry policy. OpenAI itself uses the account-wide
+limiter, retry policy and circuit breaker from llm_client. A local Ollama
+server is reached through its OpenAI-compatible /v1 API, so requests,
+streaming and caching work the same way for both. Ollama gets a small
+concurrency cap instead of account limits, and a breaker and retry policy
+of its own, so a stopped Ollama never blocks OpenAI calls, or the reverse.
+
+Each call names a task: the generate_* handler making it, or the analysis
+step in app_agent. A route maps a task to an ordered list of targets, each
+written "provider:model", e.g. ``["ollama:llama3.1", "openai:gpt-3.5-turbo"]``.
+complete_chat() tries the targets in order. It checks the response cache
+for each one before sending, and moves on only when a target is
+unavailable: a transport error, an open breaker, a rate limiter wait that
+timed out, a 429 or a 5xx. Any other error status means the request itself
+was refused, which another target would not fix, so it is raised without
+trying the rest. When a later target answers, a caption tells the user
+which one. Routes come from
+DEFAULT_ROUTES overlaid with the LLM_ROUTES environment variable (JSON). A
+task without a route uses the "default" route, and failing that the
+caller's default model on OpenAI. With LLM_LOCAL_FALLBACK on (off by
+default), Ollama is appended as the last resort to every route that does
+not already use it.
+
+Every target tried is recorded as a telemetry span under the task's name
+(see telemetry.py), including cache hits and failures that fell through.
+"""
+import contextvars
+import json
+import os
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import streamlit as st
+
+from async_llm_client import post_chat_completion_async
+from llm_cache import get_response_cache, response_cache_key
+from llm_client import (OPENAI_CHAT_URL, get_rate_limiter, get_retry_policy, iter_stream_content,
+                        post_chat_completion, render_token_stream, stream_chat_completion)
+from rate_limiter import RateLimiter, RateLimitTimeoutError
+from retry_policy import CircuitBreaker, CircuitOpenError, RetryPolicy, classify_exception
+from telemetry import CACHE_HIT, ERROR, OK, count_tokens, get_telemetry
+
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434").rstrip("/")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.1")
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "2"))
+# Local models on modest hardware take a while for long documents
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "300"))
+LOCAL_FALLBACK = os.getenv("LLM_LOCAL_FALLBACK", "false").lower() in ("1", "true", "yes")
+
+# Task -> targets in order of preference; LLM_ROUTES entries replace these
+DEFAULT_ROUTES = {
+    # Decision-path scenarios are formulaic enough for a local model
+    "behavioral_tests": (f"ollama:{OLLAMA_MODEL}", "openai:gpt-3.5-turbo"),
+}
+
+PROVIDERS = ("openai", "ollama")
+Target = namedtuple("Target", "provider model")
+
+_task = contextvars.ContextVar("llm_task", default="default")
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised when no target on a route answered"""
+
+
+class ChatProvider:
+    """An OpenAI-compatible chat-completions endpoint with its own limiter and retry policy"""
+
+    def __init__(self, name, chat_url, limiter=None, retry_policy=None, timeout=None, api_key=None):
+        self.name = name
+        self.chat_url = chat_url
+        self.limiter = limiter
+        self.retry_policy = retry_policy
+        self.timeout = timeout
+        self.api_key = api_key
+
+    def _options(self, timeout):
+        return dict(timeout=self.timeout or timeout, url=self.chat_url, limiter=self.limiter,
+                    retry_policy=self.retry_policy)
+
+    def complete(self, api_key, data, timeout=60, priority=None):
+        return post_chat_completion(self.api_key or api_key, data, priority=priority, **self._options(timeout))
+
+    def stream(self, api_key, data, timeout=60, priority=None):
+        return stream_chat_completion(self.api_key or api_key, data, priority=priority, **self._options(timeout))
+
+    async def complete_async(self, api_key, data, timeout=60, priority=None):
+        return await post_chat_completion_async(self.api_key or api_key, data, priority=priority,
+                                                **self._options(timeout))
+
+
+@st.cache_resource(show_spinner=False)
+def get_provider(name):
+    """Process-wide provider by name"""
+    if name == "openai":
+        return ChatProvider("openai", OPENAI_CHAT_URL, get_rate_limiter(), get_retry_policy())
+    if name == "ollama":
+        # One attempt: when the local server is down or slow, the next target is the better retry
+        return ChatProvider(
+            "ollama", f"{OLLAMA_HOST}/v1/chat/completions",
+            limiter=RateLimiter(0, 0, OLLAMA_MAX_CONCURRENCY),
+            retry_policy=RetryPolicy(max_attempts=1, deadline=OLLAMA_TIMEOUT, breaker=CircuitBreaker(3)),
+            timeout=OLLAMA_TIMEOUT,
+            api_key="ollama",
+        )
+    raise ValueError(f"Unknown LLM provider {name!r}")
+
+
+def parse_target(spec):
+    """Split "provider:model"; the model may itself contain colons, as in "llama3.1:8b" """
+    provider, _, model = spec.partition(":")
+    if provider not in PROVIDERS or not model:
+        raise ValueError(f"Invalid LLM route target {spec!r}; expected one of {PROVIDERS} as provider:model")
+    return Target(provider, model)
+
+
+def _load_routes():
+    """DEFAULT_ROUTES overlaid with LLM_ROUTES, parsed and checked at import"""
+    routes = dict(DEFAULT_ROUTES)
+    if os.getenv("LLM_ROUTES"):
+        routes.update(json.loads(os.environ["LLM_ROUTES"]))
+    return {task: tuple(parse_target(spec) for spec in specs) for task, specs in routes.items()}
+
+
+ROUTES = _load_routes()
+
+
+@contextmanager
+def llm_task(name):
+    """Route the enclosed calls as task `name`"""
+    token = _task.set(name)
+    try:
+        yield
+    finally:
+        _task.reset(token)
+
+
+def resolve_targets(task=None, default_model="gpt-4"):
+    """Targets to try for a task, in order"""
+    task = task or _task.get()
+    targets = ROUTES.get(task) or ROUTES.get("default") or (Target("openai", default_model),)
+    if LOCAL_FALLBACK and all(target.provider != "ollama" for target in targets):
+        targets += (Target("ollama", OLLAMA_MODEL),)
+    return targets
+
+
+def _record(task, target, began, outcome, **fields):
+    get_telemetry().record(task, target.provider, target.model, began, outcome, **fields)
+
+
+def _record_reply(task, target, began, request, content, usage=None, stream=False):
+    prompt_tokens, completion_tokens, estimated = count_tokens(request, content, usage)
+    _record(task, target, began, OK, status=200, stream=stream, prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens, tokens_estimated=estimated)
+
+
+def _describe_failure(target, response=None, error=None):
+    if error is not None:
+        return f"{target.provider}:{target.model}: {error}"
+    return f"{target.provider}:{target.model}: {response.status_code} - {response.text}"
+
+
+def _unavailable(response=None, error=None):
+    """Whether a failure says the target is down or overloaded, so the next target may answer"""
+    if error is not None:
+        # A limiter that can't admit the request in time is as unavailable as one that is down
+        return isinstance(error, (CircuitOpenError, RateLimitTimeoutError)) or classify_exception(error) is not None
+    return response.status_code == 429 or response.status_code >= 500
+
+
+def _show_fallback(targets, target):
+    """Tell the user a target other than the route's first answered"""
+    if target != targets[0]:
+        skipped = ", ".join(f"{t.provider}:{t.model}" for t in targets[:targets.index(target)])
+        st.caption(f"ℹ️ Answered by {target.provider}:{target.model}; {skipped} unavailable")
+
+
+def complete_chat(api_key, data, targets, use_cache=True, stream=False, priority=None, timeout=60, task=None):
+    """Return the reply to `data` from the first available target; raise LLMUnavailableError if none answer"""
+    task = task or _task.get()
+    failures = []
+    for target in targets:
+        began = time.perf_counter()
+        request = dict(data, model=target.model)
+        cache_key = response_cache_key(request)
+        if use_cache:
+            cached = get_response_cache().get(cache_key)
+            if cached is not None:
+                _record(task, target, began, CACHE_HIT, stream=stream)
+                _show_fallback(targets, target)
+                return cached
+        provider = get_provider(target.provider)
+        try:
+            if stream:
+                response = provider.stream(api_key, request, timeout, priority)
+            else:
+                response = provider.complete(api_key, request, timeout, priority)
+        except Exception as e:
+            _record(task, target, began, ERROR, error=e, stream=stream)
+            if not _unavailable(error=e):
+                raise
+            failures.append(_describe_failure(target, error=e))
+            continue
+        if response.status_code != 200:
+            failures.append(_describe_failure(target, response))
+            _record(task, target, began, ERROR, status=response.status_code, error=response.text, stream=stream)
+            if not _unavailable(response):
+                # A refused request (bad key, bad payload) would be refused by the next target too
+                break
+            continue
+        usage = None
+        if stream:
+            content = render_token_stream(iter_stream_content(response))
+        else:
+            body = response.json()
+            content = body["choices"][0]["message"]["content"]
+            usage = body.get("usage")
+        if use_cache:
+            get_response_cache().set(cache_key, content)
+        _record_reply(task, target, began, request, content, usage, stream)
+        _show_fallback(targets, target)
+        return content
+    raise LLMUnavailableError("; ".join(failures))
+
+
+async def complete_chat_async(api_key, data, targets, use_cache=True, priority=None, timeout=60, task=None):
+    """Async complete_chat, without streaming"""
+    task = task or _task.get()
+    failures = []
+    for target in targets:
+        began = time.perf_counter()
+        request = dict(data, model=target.model)
+        cache_key = response_cache_key(request)
+        if use_cache:
+            cached = get_response_cache().get(cache_key)
+            if cached is not None:
+                _record(task, target, began, CACHE_HIT)
+                _show_fallback(targets, target)
+                return cached
+        try:
+            response = await get_provider(target.provider).complete_async(api_key, request, timeout, priority)
+        except Exception as e:
+            _record(task, target, began, ERROR, error=e)
+            if not _unavailable(error=e):
+                raise
+            failures.append(_describe_failure(target, error=e))
+            continue
+        if response.status_code != 200:
+            failures.append(_describe_failure(target, response))
+            _record(task, target, began, ERROR, status=response.status_code, error=response.text)
+            if not _unavailable(response):
+                break
+            continue
+        body = response.json()
+        content = body["choices"][0]["message"]["content"]
+        if use_cache:
+            get_response_cache().set(cache_key, content)
+        _record_reply(task, target, began, request, content, body.get("usage"))
+        _show_fallback(targets, target)
+        return content
+    raise LLMUnavailableError("; ".join(failures))
@@ -0,0 +1,92 @@
+"""Versioned prompt templates, compiled once per process.
+
+Each prompt lives in prompts/<name>.txt as a small header, a ``---`` line and
+the prompt body with ``{field}`` placeholders::
+
+    version: 2
+    ---
+    Draft an RFE response for a {visa_category} petition ...
+
+Templates are parsed when this module is imported into a tuple of literal
+text and field names, so rendering is a single pass over that tuple with a
+dict lookup per field. Every template carries its version and a SHA-256 of
+its source for logs and benchmarks. Responses stay cached on the full
+request, so editing a template invalidates its cached replies.
+"""
+import hashlib
+import os
+from string import Formatter
+from types import MappingProxyType
+
+PROMPTS_DIR = os.getenv("PROMPTS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts"))
+
+# Rendered for fields the caller doesn't supply, as the inline prompts did
+MISSING_VALUE = "Not specified"
+
+
+class PromptTemplate:
+    """A parsed prompt template with a precomputed field list"""
+
+    def __init__(self, name, source, version=1):
+        self.name = name
+        self.version = version
+        self.source = source
+        self.source_hash = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        parts = []
+        for literal, field, format_spec, conversion in Formatter().parse(source):
+            if format_spec or conversion or (field is not None and not field.isidentifier()):
+                raise ValueError(f"Prompt template {name!r} has an unsupported placeholder {{{field}}}")
+            parts.append((literal, field))
+        self.parts = tuple(parts)
+        self.fields = tuple(dict.fromkeys(field for _, field in parts if field))
+
+    def render(self, values, **extra):
+        """Fill the template from `values` and keyword overrides"""
+        out = []
+        for literal, field in self.parts:
+            out.append(literal)
+            if field is not None:
+                value = extra[field] if field in extra else values.get(field, MISSING_VALUE)
+                out.append(str(value))
+        return "".join(out)
+
+
+def parse_template_file(path):
+    """Read a prompt file into a PromptTemplate"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    header, separator, body = text.partition("\n---\n")
+    if not separator:
+        raise ValueError(f"Prompt template {path} is missing its '---' header separator")
+    meta = {}
+    for line in header.splitlines():
+        key, _, value = line.partition(":")
+        meta[key.strip()] = value.strip()
+    return PromptTemplate(name, body.strip() + "\n", int(meta.get("version", 1)))
+
+
+def load_templates(directory=PROMPTS_DIR):
+    """Load and compile every prompt template in a directory"""
+    templates = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".txt"):
+            template = parse_template_file(os.path.join(directory, filename))
+            templates[template.name] = template
+    return MappingProxyType(templates)
+
+
+TEMPLATES = load_templates()
+
+
+def get_template(name):
+    """Return a compiled template by name"""
+    try:
+        return TEMPLATES[name]
+    except KeyError:
+        raise KeyError(f"Unknown prompt template {name!r}; expected a file in {PROMPTS_DIR}") from None
+
+
+def render_prompt(name, values, **extra):
+    """Render a named template"""
+    return get_template(name).render(values, **extra)
@@ -0,0 +1,237 @@
+"""Client-side rate limiting for OpenAI requests.
+
+RateLimiter budgets requests per minute and tokens per minute with two
+token buckets, and caps the number of requests in flight. Callers acquire a
+lease before sending a request and release it when the response has been
+read. A request's token cost is its estimated prompt tokens plus
+max_tokens, which is how the API counts it against the TPM limit.
+
+Waiters queue in priority order (lower value first, FIFO within a level),
+and only the head of the queue may take budget, so a burst of bulk work
+cannot starve an interactive request. acquire() blocks the calling thread;
+acquire_async() waits with asyncio.sleep and shares the same queue and
+budget, so threads and event loops can use one limiter.
+
+When the API answers 429 anyway, pause() holds every caller back for the
+Retry-After period. Under load, throughput levels off at the configured
+limits instead of turning into errors.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from chunking import estimate_tokens
+
+# Account limits; 0 disables the corresponding check
+RATE_LIMIT_RPM = float(os.getenv("OPENAI_RPM", "60"))
+RATE_LIMIT_TPM = float(os.getenv("OPENAI_TPM", "40000"))
+MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+# Burst allowance in seconds of budget; the API enforces per-minute limits over shorter windows
+BURST_SECONDS = float(os.getenv("OPENAI_RATE_BURST_SECONDS", "10"))
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10
+
+# Priority for requests made in the current context; see request_priority()
+_priority = contextvars.ContextVar("rate_limit_priority", default=PRIORITY_HIGH)
+
+
+class RateLimitTimeoutError(TimeoutError):
+    """Raised when a request waits past its timeout for the rate limiter"""
+
+
+@contextmanager
+def request_priority(priority):
+    """Run the enclosed calls at a rate-limit priority (lower goes first)"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+def estimate_request_tokens(data):
+    """Token cost of a chat-completions payload against the TPM limit"""
+    prompt = "".join(message.get("content") or "" for message in data.get("messages", []))
+    return estimate_tokens(prompt) + int(data.get("max_tokens") or 0)
+
+
+class TokenBucket:
+    """Bucket refilling at a per-minute rate and holding `burst_seconds` of budget; not locked on its own"""
+
+    def __init__(self, per_minute, burst_seconds=BURST_SECONDS):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` can be taken; assumes refill() was just called"""
+        # Requests bigger than the bucket wait for a full bucket and leave it in debt
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= amount
+
+
+class Lease:
+    """Budget held by one request; release it once the response has been read"""
+
+    def __init__(self, limiter, tokens, waited):
+        self.limiter = limiter
+        self.tokens = tokens
+        self.waited = waited
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.limiter._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class RateLimiter:
+    """Priority-queued RPM/TPM token buckets plus a concurrency cap, shared by threads and asyncio"""
+
+    def __init__(self, requests_per_minute=RATE_LIMIT_RPM, tokens_per_minute=RATE_LIMIT_TPM,
+                 max_concurrency=MAX_CONCURRENCY, burst_seconds=BURST_SECONDS):
+        self.requests = TokenBucket(requests_per_minute, burst_seconds) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute, burst_seconds) if tokens_per_minute > 0 else None
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self.stats = {"granted": 0, "waited_seconds": 0.0, "pauses": 0}
+
+    def _wait_time(self, tokens, now):
+        """Seconds until a request of `tokens` could start, ignoring the queue; inf if blocked on concurrency"""
+        if self.max_concurrency and self.in_flight >= self.max_concurrency:
+            return float("inf")
+        delay = max(0.0, self.paused_until - now)
+        for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+            if bucket is not None:
+                bucket.refill(now)
+                delay = max(delay, bucket.wait_time(amount))
+        return delay
+
+    def _try_take(self, entry, tokens):
+        """Grant budget if `entry` heads the queue and budget is available; else return the wait"""
+        now = time.monotonic()
+        if self._waiters[0] is not entry:
+            return None
+        delay = self._wait_time(tokens, now)
+        if delay > 0:
+            return delay
+        heapq.heappop(self._waiters)
+        for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+            if bucket is not None:
+                bucket.take(amount)
+        self.in_flight += 1
+        self.stats["granted"] += 1
+        # The next waiter may be able to go too
+        self._condition.notify_all()
+        return 0.0
+
+    def _enqueue(self, priority):
+        entry = [priority, next(self._sequence)]
+        heapq.heappush(self._waiters, entry)
+        return entry
+
+    def _abandon(self, entry):
+        self._waiters.remove(entry)
+        heapq.heapify(self._waiters)
+        self._condition.notify_all()
+
+    def _granted(self, tokens, began):
+        waited = time.monotonic() - began
+        self.stats["waited_seconds"] += waited
+        return Lease(self, tokens, waited)
+
+    def acquire(self, tokens=0, priority=None, timeout=None):
+        """Block until a request of `tokens` may be sent and return its Lease"""
+        priority = current_priority() if priority is None else priority
+        began = time.monotonic()
+        deadline = None if timeout is None else began + timeout
+        with self._condition:
+            entry = self._enqueue(priority)
+            while True:
+                delay = self._try_take(entry, tokens)
+                if delay == 0.0:
+                    return self._granted(tokens, began)
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._abandon(entry)
+                    raise RateLimitTimeoutError("Timed out waiting for the OpenAI rate limit")
+                waits = [value for value in (delay, remaining) if value is not None and value != float("inf")]
+                self._condition.wait(min(waits) if waits else None)
+
+    async def acquire_async(self, tokens=0, priority=None, timeout=None, poll_interval=0.05):
+        """Wait without blocking the event loop until a request may be sent; return its Lease"""
+        priority = current_priority() if priority is None else priority
+        began = time.monotonic()
+        deadline = None if timeout is None else began + timeout
+        with self._condition:
+            entry = self._enqueue(priority)
+        try:
+            while True:
+                with self._condition:
+                    delay = self._try_take(entry, tokens)
+                    if delay == 0.0:
+                        return self._granted(tokens, began)
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise RateLimitTimeoutError("Timed out waiting for the OpenAI rate limit")
+                await asyncio.sleep(min(delay, poll_interval) if delay else poll_interval)
+        except BaseException:
+            with self._condition:
+                if entry in self._waiters:
+                    self._abandon(entry)
+            raise
+
+    def _release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def pause(self, seconds):
+        """Hold back every caller for `seconds`, e.g. after a 429 with Retry-After"""
+        with self._condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.stats["pauses"] += 1
+            self._condition.notify_all()
+
+    def snapshot(self):
+        """Current budget, queue and counters, for display"""
+        with self._condition:
+            now = time.monotonic()
+            for bucket in (self.requests, self.tokens):
+                if bucket is not None:
+                    bucket.refill(now)
+            return {
+                "requests_available": self.requests.level if self.requests else None,
+                "tokens_available": self.tokens.level if self.tokens else None,
+                "in_flight": self.in_flight,
+                "queued": len(self._waiters),
+                **self.stats,
+            }
@@ -0,0 +1,172 @@
+"""Timing of the Streamlit script body on every rerun.
+
+Streamlit re-executes the whole script on each widget interaction, so time
+spent in static blocks is paid on every click. Set APP_PROFILE to measure it:
+
+    APP_PROFILE=sections streamlit run app.py   # time the blocks wrapped in profile_section()
+    APP_PROFILE=cprofile streamlit run app.py   # also run each rerun under cProfile
+
+The script calls start_rerun_profile() before its first block and
+finish_rerun_profile() after its last. Blocks are wrapped in
+``with profile_section(name):`` and nest, so a section inside a tab is
+reported as "tab / section". When a rerun finishes, the sidebar lists its
+slowest blocks next to their mean and max over every rerun in the process.
+"(rest of script)" is the time outside any top-level section. One summary
+line is also logged.
+
+With cprofile, each rerun's pstats are dumped to APP_PROFILE_DIR. Open them
+with ``python -m pstats <file>`` or snakeviz. The sidebar also shows the
+functions with the largest cumulative time. With APP_PROFILE unset,
+profile_section() returns a shared no-op context, so the hooks cost nothing.
+"""
+import contextvars
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+import streamlit as st
+
+from llm_cache import CACHE_DIR
+
+PROFILE_MODE = os.getenv("APP_PROFILE", "off").lower()
+PROFILE_ENABLED = PROFILE_MODE in ("sections", "cprofile")
+PROFILE_DIR = os.getenv("APP_PROFILE_DIR", os.path.join(CACHE_DIR, "profiles"))
+# Blocks and functions listed per rerun
+PROFILE_TOP = int(os.getenv("APP_PROFILE_TOP", "10"))
+
+REST_OF_SCRIPT = "(rest of script)"
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("rerun_profile", default=None)
+_noop = nullcontext()
+
+
+class RerunStats:
+    """Per-block timings accumulated over every profiled rerun in the process"""
+
+    def __init__(self):
+        self.reruns = 0
+        self.blocks = {}
+        self._lock = threading.Lock()
+
+    def add(self, timings):
+        with self._lock:
+            self.reruns += 1
+            for block, seconds in timings.items():
+                count, total, longest = self.blocks.get(block, (0, 0.0, 0.0))
+                self.blocks[block] = (count + 1, total + seconds, max(longest, seconds))
+
+    def get(self, block):
+        with self._lock:
+            return self.blocks.get(block, (0, 0.0, 0.0))
+
+
+@st.cache_resource(show_spinner=False)
+def get_rerun_stats():
+    """Process-wide rerun timings"""
+    return RerunStats()
+
+
+class RerunProfile:
+    """Section timings, and optionally a cProfile, for one script run"""
+
+    def __init__(self, name, use_cprofile=False):
+        self.name = name
+        self.timings = {}
+        self.path = []
+        self.profiler = None
+        if use_cprofile:
+            self.profiler = cProfile.Profile()
+            try:
+                self.profiler.enable()
+            except ValueError:
+                # Another profiler or debugger already traces this thread
+                self.profiler = None
+        self.began = time.perf_counter()
+
+    @contextmanager
+    def section(self, name):
+        self.path.append(name)
+        block = " / ".join(self.path)
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            # A block run twice in one rerun, e.g. in a loop, is reported once with its total
+            self.timings[block] = self.timings.get(block, 0.0) + time.perf_counter() - began
+            self.path.pop()
+
+    def finish(self):
+        """Stop timing and return the rerun's total seconds"""
+        total = time.perf_counter() - self.began
+        if self.profiler is not None:
+            self.profiler.disable()
+        top_level = sum(seconds for block, seconds in self.timings.items() if " / " not in block)
+        self.timings[REST_OF_SCRIPT] = max(0.0, total - top_level)
+        return total
+
+    def dump_stats(self):
+        """Write the cProfile stats to PROFILE_DIR and return the path"""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        now = time.time()
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now * 1000) % 1000:03d}"
+        path = os.path.join(PROFILE_DIR, f"{self.name}-{stamp}.pstats")
+        self.profiler.dump_stats(path)
+        return path
+
+    def top_functions(self, limit=PROFILE_TOP):
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).strip_dirs().sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+
+def start_rerun_profile(name):
+    """Begin profiling this script run when APP_PROFILE is set"""
+    if PROFILE_ENABLED:
+        _current.set(RerunProfile(name, use_cprofile=PROFILE_MODE == "cprofile"))
+
+
+def profile_section(name):
+    """Time the enclosed block as part of the current rerun's profile"""
+    profile = _current.get()
+    return profile.section(name) if profile is not None else _noop
+
+
+def finish_rerun_profile():
+    """End the current rerun's profile, record it and report the slowest blocks in the sidebar"""
+    profile = _current.get()
+    if profile is None:
+        return
+    _current.set(None)
+    total = profile.finish()
+    stats = get_rerun_stats()
+    stats.add(profile.timings)
+    slowest = sorted(profile.timings.items(), key=lambda item: item[1], reverse=True)[:PROFILE_TOP]
+    dump_path = profile.dump_stats() if profile.profiler is not None else None
+    logger.info("%s rerun %.1f ms; slowest: %s%s", profile.name, total * 1000,
+                ", ".join(f"{block} {seconds * 1000:.1f} ms" for block, seconds in slowest[:3]),
+                f"; pstats in {dump_path}" if dump_path else "")
+
+    rows = []
+    for block, seconds in slowest:
+        count, block_total, longest = stats.get(block)
+        rows.append({
+            "Block": block,
+            "ms": round(seconds * 1000, 1),
+            "% of rerun": round(100 * seconds / total, 1) if total else 0.0,
+            "Mean ms": round(block_total / count * 1000, 1),
+            "Max ms": round(longest * 1000, 1),
+        })
+    with st.sidebar.expander(f"⏱️ Rerun profile: {total * 1000:.0f} ms"):
+        st.caption(f"Slowest blocks this rerun; mean and max over {stats.reruns} reruns in this process")
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        if dump_path:
+            st.caption(f"cProfile stats: {dump_path}")
+            st.code(profile.top_functions(), language=None)
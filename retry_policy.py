@@ -0,0 +1,276 @@
+"""Retries, backoff and a circuit breaker for OpenAI requests.
+
+RetryPolicy.run() sends a request until it succeeds, fails for a reason a
+retry cannot fix, or the call's deadline budget runs out. A failure is
+retryable when it is a timeout, a dropped connection, a 429, or a 408, 409
+or 5xx response. Between attempts it sleeps with exponential backoff and
+full jitter, or for the server's Retry-After when one is given, and it never
+sleeps past the deadline.
+
+A CircuitBreaker counts consecutive outage failures: timeouts, connection
+errors and 5xx responses. A 429 only means the service is busy, so it does
+not count. After OPENAI_BREAKER_THRESHOLD of these failures in a row the
+breaker opens. While open, calls fail at once with CircuitOpenError instead
+of each user waiting out a full deadline. After OPENAI_BREAKER_RESET_SECONDS
+one probe request is let through, and its result closes or reopens the
+breaker.
+
+RetryMetrics counts attempts, retries by reason, time spent backing off,
+calls that recovered and calls that gave up. run_async() applies the same
+policy, breaker and metrics to coroutines.
+"""
+import asyncio
+import email.utils
+import itertools
+import os
+import random
+import threading
+import time
+from collections import Counter
+
+import httpx
+import requests
+
+MAX_ATTEMPTS = int(os.getenv("OPENAI_MAX_ATTEMPTS", "4"))
+RETRY_BASE_DELAY = float(os.getenv("OPENAI_RETRY_BASE_DELAY", "1"))
+RETRY_MAX_DELAY = float(os.getenv("OPENAI_RETRY_MAX_DELAY", "20"))
+# Total seconds one call may spend across attempts and backoff
+REQUEST_DEADLINE = float(os.getenv("OPENAI_REQUEST_DEADLINE", "120"))
+BREAKER_THRESHOLD = int(os.getenv("OPENAI_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("OPENAI_BREAKER_RESET_SECONDS", "30"))
+
+RETRYABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+# Failures that suggest the service is down rather than busy
+OUTAGE_REASONS = frozenset({"timeout", "connection", "status 500", "status 502", "status 503", "status 504"})
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of sending a request while the circuit breaker is open"""
+
+
+def retry_after_seconds(response):
+    """Server-requested wait from Retry-After or retry-after-ms, or None"""
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_response(response):
+    """Retry reason for a response, or None if it should be returned as is"""
+    return f"status {response.status_code}" if response.status_code in RETRYABLE_STATUS else None
+
+
+def classify_exception(error):
+    """Retry reason for an exception raised while sending, or None if it should propagate"""
+    # requests for the sync client, httpx for the async one
+    if isinstance(error, (requests.Timeout, httpx.TimeoutException)):
+        return "timeout"
+    if isinstance(error, (requests.ConnectionError, httpx.TransportError)):
+        return "connection"
+    return None
+
+
+class RetryMetrics:
+    """Thread-safe counters for retried calls"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.attempts = 0
+        self.retries = Counter()
+        self.backoff_seconds = 0.0
+        self.recovered = 0
+        self.gave_up = 0
+        self.fast_failed = 0
+
+    def record_attempt(self):
+        with self._lock:
+            self.attempts += 1
+
+    def record_retry(self, reason, delay):
+        with self._lock:
+            self.retries[reason] += 1
+            self.backoff_seconds += delay
+
+    def record_call(self, attempts, succeeded):
+        with self._lock:
+            self.calls += 1
+            if not succeeded:
+                self.gave_up += 1
+            elif attempts > 1:
+                self.recovered += 1
+
+    def record_fast_fail(self):
+        with self._lock:
+            self.fast_failed += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "attempts": self.attempts,
+                "retries": sum(self.retries.values()),
+                "retries_by_reason": dict(self.retries),
+                "backoff_seconds": round(self.backoff_seconds, 3),
+                "recovered": self.recovered,
+                "gave_up": self.gave_up,
+                "fast_failed": self.fast_failed,
+            }
+
+
+class CircuitBreaker:
+    """Opens after consecutive outage failures and lets one probe through after a cool-down"""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a request may be sent now"""
+        if self.threshold <= 0:
+            return
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            remaining = self.opened_at + self.reset_seconds - time.monotonic()
+            if self.state == self.OPEN and remaining <= 0:
+                # This caller is the probe; everyone else keeps failing fast until it reports back
+                self.state = self.HALF_OPEN
+                return
+        raise CircuitOpenError(
+            f"OpenAI API looks unavailable after {self.failures} consecutive failures; "
+            f"not sending requests for another {max(0, round(remaining))}s"
+        )
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.threshold > 0 and self.failures >= self.threshold):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """Reopen after a probe that ended without a verdict, so the next caller can probe"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+
+class RetryPolicy:
+    """Retries retryable failures with jittered exponential backoff within a deadline"""
+
+    def __init__(self, max_attempts=MAX_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY,
+                 deadline=REQUEST_DEADLINE, breaker=None, metrics=None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = metrics or RetryMetrics()
+
+    def backoff(self, attempt, retry_after=None):
+        """Seconds to wait before attempt `attempt + 1`"""
+        if retry_after is not None:
+            # Honour the server, plus a little jitter so waiting clients don't return in lockstep
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _start(self, deadline):
+        """Fail fast if the breaker is open; return when the call's deadline expires"""
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self.metrics.record_fast_fail()
+            raise
+        return time.monotonic() + (self.deadline if deadline is None else deadline)
+
+    def _settle(self, attempt, response, error, expires):
+        """Record one attempt; return the backoff before the next, None if `response` is final, or raise"""
+        reason = classify_response(response) if error is None else classify_exception(error)
+        if error is not None and reason is None:
+            self.breaker.release_probe()
+            self.metrics.record_call(attempt, False)
+            raise error
+
+        if reason in OUTAGE_REASONS:
+            self.breaker.record_failure()
+        elif response is not None:
+            # Any answer from the API, even a 4xx, shows it is up
+            self.breaker.record_success()
+        if reason is None:
+            self.metrics.record_call(attempt, True)
+            return None
+
+        delay = self.backoff(attempt, retry_after_seconds(response))
+        if (attempt >= self.max_attempts or time.monotonic() + delay >= expires
+                or self.breaker.state == CircuitBreaker.OPEN):
+            self.metrics.record_call(attempt, False)
+            if error is not None:
+                raise error
+            return None
+        self.metrics.record_retry(reason, delay)
+        return delay
+
+    def run(self, send, deadline=None):
+        """Call send(remaining_seconds) until it returns a final response; return it or raise the last error"""
+        expires = self._start(deadline)
+        for attempt in itertools.count(1):
+            self.metrics.record_attempt()
+            try:
+                response, error = send(expires - time.monotonic()), None
+            except Exception as e:
+                response, error = None, e
+            except BaseException:
+                # Cancelled or stopped mid-call (a Streamlit rerun, Ctrl-C): no verdict, so let another caller probe
+                self.breaker.release_probe()
+                raise
+            delay = self._settle(attempt, response, error, expires)
+            if delay is None:
+                return response
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+
+    async def run_async(self, send, deadline=None):
+        """run() for a coroutine function `send`, backing off with asyncio.sleep; responses must already be read"""
+        expires = self._start(deadline)
+        for attempt in itertools.count(1):
+            self.metrics.record_attempt()
+            try:
+                response, error = await send(expires - time.monotonic()), None
+            except Exception as e:
+                response, error = None, e
+            except BaseException:
+                # Cancelled mid-call: no verdict, so let another caller probe
+                self.breaker.release_probe()
+                raise
+            delay = self._settle(attempt, response, error, expires)
+            if delay is None:
+                return response
+            await asyncio.sleep(delay)
@@ -0,0 +1,93 @@
+"""Rebuild data/soc_job_zones.tsv from the O*NET database text files.
+
+Download the "Text" release of the O*NET database from
+https://www.onetcenter.org/database.html and run, from the repository root:
+
+    python scripts/build_soc_data.py "db_29_0_text/Occupation Data.txt" "db_29_0_text/Job Zones.txt" \
+        [--crosswalk soc_2010_to_2018_crosswalk.csv]
+
+O*NET-SOC codes (15-1252.00, 15-1252.01, ...) are collapsed to their SOC 2018
+code. The .00 occupation supplies the title and job zone; otherwise the
+lowest job zone among the detailed occupations is used, since that is the
+one an adjudicator will point to, and the title already in the file is kept. The optional BLS crosswalk (a CSV with
+"2010 SOC Code" and "2018 SOC Code" columns) fills the "formerly" column.
+Major group rows are kept from the existing file.
+"""
+import argparse
+import csv
+import os
+from collections import defaultdict
+
+OUTPUT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "soc_job_zones.tsv")
+
+
+def read_tab_file(path):
+    with open(path, encoding="utf-8") as f:
+        return list(csv.DictReader(f, delimiter="\t"))
+
+
+def read_existing(path):
+    """Header comment lines, major group rows and occupation titles from the current data file"""
+    comments, groups, titles = [], [], {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#"):
+                comments.append(line)
+                continue
+            row = line.rstrip("\n").split("\t")
+            if row[0].endswith("-0000"):
+                groups.append(row)
+            elif len(row) > 2:
+                titles[row[0]] = row[2]
+    return comments, groups, titles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("occupation_data", help='O*NET "Occupation Data.txt"')
+    parser.add_argument("job_zones", help='O*NET "Job Zones.txt"')
+    parser.add_argument("--crosswalk", help="BLS SOC 2010 to 2018 crosswalk CSV")
+    parser.add_argument("--output", default=OUTPUT)
+    args = parser.parse_args()
+
+    zones = {row["O*NET-SOC Code"]: int(row["Job Zone"]) for row in read_tab_file(args.job_zones)}
+    occupations = {}
+    for row in read_tab_file(args.occupation_data):
+        onet_code = row["O*NET-SOC Code"]
+        code = onet_code.split(".")[0]
+        entry = occupations.setdefault(code, {"title": None, "zones": []})
+        if onet_code in zones:
+            entry["zones"].append(zones[onet_code])
+        if onet_code.endswith(".00"):
+            entry["title"] = row["Title"]
+            entry["zone"] = zones.get(onet_code)
+        elif entry["title"] is None:
+            entry["title"] = row["Title"]
+
+    formerly = defaultdict(list)
+    if args.crosswalk:
+        with open(args.crosswalk, encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                old, new = row["2010 SOC Code"].strip(), row["2018 SOC Code"].strip()
+                if old != new and old not in formerly[new]:
+                    formerly[new].append(old)
+
+    comments, groups, titles = read_existing(args.output)
+    rows = list(groups)
+    for code, entry in occupations.items():
+        zone = entry.get("zone") or (min(entry["zones"]) if entry["zones"] else "")
+        # Without a .00 occupation, O*NET has no row titled for the SOC code itself
+        title = entry["title"] if "zone" in entry else titles.get(code, entry["title"])
+        rows.append([code, str(zone), title, ",".join(formerly.get(code, []))])
+    rows.sort(key=lambda row: row[0])
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.writelines(comments)
+        f.write("code\tjob_zone\ttitle\tformerly\n")
+        for row in rows:
+            f.write("\t".join(row) + "\n")
+    print(f"Wrote {len(occupations)} occupations and {len(groups)} major groups to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""Full-text search over reference content and past generations.
+
+An in-memory BM25 inverted index, one per process, over:
+
+- every template and resource entry in content_store, re-indexed whenever
+  the content file is reloaded;
+- the result of every succeeded background job in the jobs table, found
+  only by the browser session that submitted it;
+- with SEARCH_PAST_GENERATIONS on, every successful case in the bulk
+  generation results files under BULK_OUTPUT_DIR.
+
+The index is built on a background thread when first requested, so the
+first page load isn't held up. Before a query it is brought up to date, at
+most every SEARCH_REFRESH_SECONDS, by reading only the jobs finished since
+the last refresh and the lines appended to each results file since then.
+Jobs removed from the table and deleted results files drop out of the index.
+
+Postings are compact arrays of document numbers and term counts. A query
+scores each of its terms' postings with numpy and ranks with argpartition,
+so it answers in a few milliseconds with thousands of stored briefs.
+Removed documents leave holes that are skipped while scoring and compacted
+away once they outnumber the live ones.
+
+A job's document carries the job owner id, and a query only sees the
+documents of the owner it passes, plus those without an owner. The app has
+no sign-in, so SEARCH_PAST_GENERATIONS, which indexes jobs without their
+owners and adds the bulk results files, shares every session's briefs with
+everyone using the server. It is off by default.
+"""
+import glob
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from array import array
+from collections import Counter, namedtuple
+
+import numpy as np
+import streamlit as st
+
+from bulk_rfe import BULK_OUTPUT_DIR
+from content_store import get_content_store, render_cards
+from job_queue import SUCCEEDED, get_job_queue
+
+SEARCH_PAST_GENERATIONS = os.getenv("SEARCH_PAST_GENERATIONS", "false").lower() == "true"
+SEARCH_REFRESH_SECONDS = float(os.getenv("SEARCH_REFRESH_SECONDS", "5"))
+SEARCH_RESULTS = int(os.getenv("SEARCH_RESULTS", "10"))
+
+# Title terms count this many times over, so a hit in the title outranks one in passing
+TITLE_WEIGHT = 3
+SNIPPET_CHARS = 240
+
+TEMPLATES, RESOURCES, GENERATIONS = "templates", "resources", "generations"
+SOURCE_LABELS = {TEMPLATES: "📊 Template", RESOURCES: "📚 Resource", GENERATIONS: "📄 Past brief"}
+
+_TAG = re.compile(r"<[^>]+>")
+# Keeps codes such as "H-1B", "I-485" and "214.2" whole
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the their this to was were will with"
+    .split()
+)
+
+logger = logging.getLogger(__name__)
+
+# body is shown when the hit is opened: the cards of a content entry, or the markdown of a generation.
+# owner is the job owner id of a session's generation; documents without one are found by everyone
+Document = namedtuple("Document", ["key", "source", "title", "text", "body", "columns", "owner"], defaults=(None,))
+SearchHit = namedtuple("SearchHit", ["document", "score", "snippet"])
+
+
+def plain_text(text):
+    """Text with HTML tags removed and whitespace collapsed"""
+    return " ".join(_TAG.sub(" ", text).split())
+
+
+def tokenize(text):
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+def count_terms(text):
+    """Counter of the terms in text; the same as Counter(tokenize(text)), with less work per token"""
+    counts = Counter(_TOKEN.findall(text.lower()))
+    for stopword in _STOPWORDS.intersection(counts):
+        del counts[stopword]
+    return counts
+
+
+def snippet(text, terms, width=SNIPPET_CHARS):
+    """The stretch of text around the first query term, or its start"""
+    match = re.search("|".join(rf"\b{re.escape(term)}\b" for term in terms), text, re.IGNORECASE) if terms else None
+    start = max(0, match.start() - width // 3) if match else 0
+    excerpt = text[start:start + width]
+    return f"{'…' if start else ''}{excerpt}{'…' if start + width < len(text) else ''}"
+
+
+class BM25Index:
+    """Inverted index ranked with BM25; documents can be added, replaced and removed at any time"""
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents = []  # by document number; None once removed
+        self.numbers = {}  # document key -> number
+        self.lengths = array("I")
+        self.live = bytearray()
+        self.owners = {None: 0}  # owner -> owner number
+        self.owner_numbers = array("I")  # by document number
+        self.total_length = 0
+        self.postings = {}  # term -> (document numbers, term counts)
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def __contains__(self, key):
+        return key in self.numbers
+
+    def add(self, document):
+        """Index a document, replacing any with the same key"""
+        self.remove(document.key)
+        counts = count_terms(document.text)
+        for term, count in count_terms(document.title).items():
+            counts[term] += count * TITLE_WEIGHT
+        number = len(self.documents)
+        self.documents.append(document)
+        self.numbers[document.key] = number
+        length = sum(counts.values())
+        self.lengths.append(length)
+        self.live.append(1)
+        self.owner_numbers.append(self.owners.setdefault(document.owner, len(self.owners)))
+        self.total_length += length
+        postings = self.postings
+        for term, count in counts.items():
+            posting = postings.get(term)
+            if posting is None:
+                posting = postings[term] = (array("I"), array("I"))
+            posting[0].append(number)
+            posting[1].append(count)
+
+    def remove(self, key):
+        number = self.numbers.pop(key, None)
+        if number is None:
+            return
+        self.documents[number] = None
+        self.live[number] = 0
+        self.total_length -= self.lengths[number]
+        if len(self.documents) - len(self.numbers) > max(1000, len(self.numbers)):
+            self._compact()
+
+    def _compact(self):
+        """Drop removed documents from the postings; document numbers stay as they are"""
+        live = np.frombuffer(bytes(self.live), dtype=np.bool_)
+        for term, (numbers, term_counts) in list(self.postings.items()):
+            numbers_np = np.array(numbers, dtype=np.uint32)
+            keep = live[numbers_np]
+            if keep.all():
+                continue
+            if not keep.any():
+                del self.postings[term]
+                continue
+            kept_numbers, kept_counts = array("I"), array("I")
+            kept_numbers.frombytes(numbers_np[keep].tobytes())
+            kept_counts.frombytes(np.array(term_counts, dtype=np.uint32)[keep].tobytes())
+            self.postings[term] = (kept_numbers, kept_counts)
+
+    def search(self, query, limit=SEARCH_RESULTS, owner=None):
+        """The best `limit` hits for a query among the documents `owner` may see, highest score first"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.numbers:
+            return []
+        live = np.frombuffer(bytes(self.live), dtype=np.bool_)
+        # Another session's generations are skipped like removed documents
+        owners = np.array(self.owner_numbers, dtype=np.uint32)
+        visible = live & ((owners == 0) | (owners == self.owners.get(owner, 0)))
+        lengths = np.array(self.lengths, dtype=np.float64)
+        average_length = max(1.0, self.total_length / len(self.numbers))
+        norms = self.k1 * (1 - self.b + self.b * lengths / average_length)
+        scores = np.zeros(len(self.documents))
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            numbers = np.array(posting[0], dtype=np.uint32)
+            alive = visible[numbers]
+            numbers = numbers[alive]
+            if not len(numbers):
+                continue
+            counts = np.array(posting[1], dtype=np.float64)[alive]
+            idf = math.log(1 + (len(self.numbers) - len(numbers) + 0.5) / (len(numbers) + 0.5))
+            scores[numbers] += idf * counts * (self.k1 + 1) / (counts + norms[numbers])
+        matched = np.flatnonzero(scores)
+        if len(matched) > limit:
+            matched = matched[np.argpartition(-scores[matched], limit)[:limit]]
+        ranked = matched[np.argsort(-scores[matched], kind="stable")]
+        return [SearchHit(self.documents[number], float(scores[number]), snippet(self.documents[number].text, terms))
+                for number in ranked]
+
+
+class LibrarySearch:
+    """BM25 index over the content library and past generations, kept up to date incrementally"""
+
+    def __init__(self, content_store, job_queue=None, bulk_dir=None, share_generations=False,
+                 refresh_seconds=SEARCH_REFRESH_SECONDS):
+        self.content_store = content_store
+        self.job_queue = job_queue
+        self.bulk_dir = bulk_dir
+        # Index jobs without their owners, so every session finds them
+        self.share_generations = share_generations
+        self.refresh_seconds = refresh_seconds
+        self.index = BM25Index()
+        self.ready = threading.Event()
+        self._lock = threading.Lock()
+        self._refreshed = 0.0
+        self._content_version = None
+        self._content_keys = set()
+        self._jobs_since = 0.0
+        self._job_keys = set()
+        self._bulk_offsets = {}  # results file -> bytes indexed
+        self._bulk_keys = {}  # results file -> document keys
+
+    def start(self):
+        """Build the index on a background thread"""
+        threading.Thread(target=self._build, name="library-search", daemon=True).start()
+        return self
+
+    def _build(self):
+        began = time.perf_counter()
+        try:
+            self.refresh()
+            logger.info("Search index built: %d documents in %.1f s", len(self.index), time.perf_counter() - began)
+        except Exception:
+            logger.exception("Could not build the search index")
+        finally:
+            self.ready.set()
+
+    def refresh(self):
+        """Index what changed since the last refresh"""
+        with self._lock:
+            self._refresh_content()
+            if self.job_queue is not None:
+                self._refresh_jobs()
+            if self.bulk_dir:
+                self._refresh_bulk()
+            self._refreshed = time.monotonic()
+
+    def _refresh_content(self):
+        content = self.content_store.get()
+        if self.content_store.version == self._content_version:
+            return
+        for key in self._content_keys:
+            self.index.remove(key)
+        self._content_keys = set()
+        for entry in content.entries:
+            key = f"content:{entry.library}:{entry.title}"
+            text = plain_text(" ".join(entry.cards + entry.keywords + entry.visa_types))
+            self.index.add(Document(key, entry.library, entry.title, text, entry.cards, entry.columns))
+            self._content_keys.add(key)
+        self._content_version = self.content_store.version
+
+    def _refresh_jobs(self):
+        for job in self.job_queue.succeeded_since(self._jobs_since):
+            key = f"job:{job['id']}"
+            owner = None if self.share_generations else job["owner"]
+            self.index.add(Document(key, GENERATIONS, job["label"], plain_text(job["result"]), (job["result"],), 1,
+                                    owner))
+            self._job_keys.add(key)
+            self._jobs_since = max(self._jobs_since, job["finished_at"])
+        # Jobs removed from the Background Jobs list leave the index too; succeeded jobs are only ever deleted
+        if self.job_queue.count(SUCCEEDED) == len(self._job_keys):
+            return
+        forgotten = self._job_keys - {f"job:{job_id}" for job_id in self.job_queue.succeeded_ids()}
+        for key in forgotten:
+            self.index.remove(key)
+        self._job_keys -= forgotten
+
+    def _refresh_bulk(self):
+        paths = set(glob.glob(os.path.join(self.bulk_dir, "*.jsonl")))
+        for path in set(self._bulk_offsets) - paths:
+            self._drop_bulk_file(path)
+        for path in sorted(paths):
+            offset = self._bulk_offsets.get(path, 0)
+            try:
+                size = os.path.getsize(path)
+                if size < offset:
+                    # Rewritten rather than appended to; read it again from the start
+                    self._drop_bulk_file(path)
+                    offset = 0
+                if size == offset:
+                    continue
+                with open(path, "rb") as f:
+                    f.seek(offset)
+                    data = f.read(size - offset)
+            except OSError:
+                continue
+            # A line still being written is read on a later refresh
+            complete = data[:data.rfind(b"\n") + 1]
+            self._bulk_offsets[path] = offset + len(complete)
+            for line in complete.decode("utf-8", errors="replace").splitlines():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("status") != "ok" or not record.get("response"):
+                    continue
+                key = f"bulk:{os.path.basename(path)}:{record['case_id']}"
+                title = f"{record.get('case_type', '')} - {record.get('visa_category', '')} ({record['case_id']})"
+                self.index.add(Document(key, GENERATIONS, title, plain_text(record["response"]),
+                                        (record["response"],), 1))
+                self._bulk_keys.setdefault(path, set()).add(key)
+
+    def _drop_bulk_file(self, path):
+        for key in self._bulk_keys.pop(path, ()):
+            self.index.remove(key)
+        self._bulk_offsets.pop(path, None)
+
+    def search(self, query, limit=SEARCH_RESULTS, owner=None):
+        """Ranked hits for a query, refreshing the index first if it is due"""
+        self.ready.wait()
+        if time.monotonic() - self._refreshed >= self.refresh_seconds:
+            self.refresh()
+        with self._lock:
+            return self.index.search(query, limit, owner)
+
+
+@st.cache_resource(show_spinner=False)
+def get_library_search():
+    """Process-wide search index, built in the background from first use"""
+    return LibrarySearch(get_content_store(), get_job_queue(), BULK_OUTPUT_DIR if SEARCH_PAST_GENERATIONS else None,
+                         share_generations=SEARCH_PAST_GENERATIONS).start()
+
+
+def show_library_search(owner=None):
+    """Search box over templates, resources and the owner's past briefs, with the ranked hits below it"""
+    search = get_library_search()
+    query = st.text_input("🔎 Search templates, resources and past briefs", key="library_search",
+                          placeholder="e.g. specialized knowledge L-1B, ability to pay, motion to reopen")
+    if not query.strip():
+        return
+    if not search.ready.is_set():
+        with st.spinner("Building the search index..."):
+            search.ready.wait()
+    began = time.perf_counter()
+    hits = search.search(query, owner=owner)
+    elapsed = time.perf_counter() - began
+    if not hits:
+        st.info(f"No matches for “{query}”.")
+        return
+    st.caption(f"Best {len(hits)} matches among {len(search.index)} documents · {elapsed * 1000:.1f} ms")
+    for hit in hits:
+        document = hit.document
+        with st.expander(f"{SOURCE_LABELS[document.source]} · {document.title} · {hit.score:.1f}"):
+            st.caption(hit.snippet)
+            if document.source == GENERATIONS:
+                st.markdown(document.body[0])
+            else:
+                render_cards(document.body, document.columns)
@@ -0,0 +1,98 @@
+"""Batch SOC code checks for spreadsheets of positions.
+
+An uploaded CSV or Excel sheet of positions is annotated in one vectorised
+pass: codes are normalised with a pandas string extract, SOC 2010 codes are
+mapped to their successors, and the whole column is left-merged against the
+SOC/job-zone table from soc_index. Title search only runs for the rows whose
+code did not resolve.
+"""
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from soc_index import SOC_INDEX, SPECIALTY_MIN_JOB_ZONE
+
+# Header names recognised as the SOC code and job title columns, lowercased
+CODE_COLUMNS = ("soc code", "soc_code", "soc", "code", "onet code", "o*net-soc code")
+TITLE_COLUMNS = ("position title", "job title", "title", "position", "soc title")
+
+OCCUPATIONS = pd.DataFrame(
+    [(o.code, o.title, o.job_zone, SOC_INDEX.major_groups.get(o.major_group)) for o in SOC_INDEX.occupations.values()],
+    columns=["SOC 2018 Code", "SOC Title", "Job Zone", "Major Group"],
+).astype({"Job Zone": "Int64"})
+
+
+def read_positions(file):
+    """Read an uploaded CSV or Excel sheet with every column as text"""
+    name = getattr(file, "name", "").lower()
+    if name.endswith((".xlsx", ".xls")):
+        return pd.read_excel(file, dtype=str)
+    return pd.read_csv(file, dtype=str)
+
+
+def find_column(df, candidates):
+    """Return the first column whose header matches one of the candidates"""
+    headers = {str(column).strip().lower(): column for column in df.columns}
+    for candidate in candidates:
+        if candidate in headers:
+            return headers[candidate]
+    return None
+
+
+def annotate_positions(df, code_column, title_column=None):
+    """Append SOC title, job zone, status and notes columns to a positions sheet"""
+    codes = df[code_column].fillna("").astype(str).str.strip()
+    parts = codes.str.extract(r"^(\d{2})-?(\d{4})(?:\.\d{2})?$")
+    normalized = (parts[0] + "-" + parts[1]).where(parts[0].notna())
+    resolved = normalized.map(SOC_INDEX.aliases).fillna(normalized)
+
+    # A sheet can already have these columns (e.g. a re-uploaded annotated sheet); keep them
+    # and mark the looked-up ones instead of letting the merge rename both with _x/_y
+    reference = OCCUPATIONS.rename(columns={
+        column: f"{column} (reference)" for column in OCCUPATIONS.columns if column in df.columns
+    })
+    code, title, job_zone = reference.columns[:3]
+
+    result = df.copy()
+    result["_code"] = resolved
+    result = result.merge(reference, how="left", left_on="_code", right_on=code).drop(columns="_code")
+
+    found = result[title].notna()
+    below = found & (result[job_zone].fillna(SPECIALTY_MIN_JOB_ZONE) < SPECIALTY_MIN_JOB_ZONE).astype(bool)
+    # Status and Notes are always this check's verdict, replacing any from an earlier run
+    result["Status"] = np.select([~found, below], ["NOT_FOUND", "WARNING"], default="OK")
+
+    notes = pd.Series("", index=result.index)
+    renumbered = found & (normalized != resolved)
+    notes[renumbered] = "SOC 2010 code; now " + resolved[renumbered]
+    notes[parts[0].isna() & (codes != "")] = "Not a valid SOC code format"
+    # The bundled table is a subset of SOC, so a well-formed miss is unlisted, not wrong
+    notes[~found & parts[0].notna()] = "Not in the bundled SOC subset; verify on O*NET"
+    notes[found & below] = "Job Zone " + result[job_zone][found & below].astype(str) + "; consider a Job Zone 4 or 5 code"
+
+    if title_column is not None:
+        # Only misses need the slower title search
+        for index in result.index[~found]:
+            title = result.at[index, title_column]
+            matches = SOC_INDEX.search_titles(title, limit=1) if isinstance(title, str) and title.strip() else []
+            if matches:
+                occupation, _ = matches[0]
+                suggestion = f"Closest title match: {occupation.code} {occupation.title} (Job Zone {occupation.job_zone})"
+                notes[index] = f"{notes[index]}; {suggestion}" if notes[index] else suggestion
+    result["Notes"] = notes
+    return result
+
+
+def summarize(annotated):
+    """Count positions by status"""
+    counts = annotated["Status"].value_counts()
+    return {status: int(counts.get(status, 0)) for status in ("OK", "WARNING", "NOT_FOUND")}
+
+
+def to_excel_bytes(df, sheet_name="SOC Check"):
+    """Serialise a DataFrame to an .xlsx file in memory"""
+    buffer = BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False, sheet_name=sheet_name)
+    return buffer.getvalue()
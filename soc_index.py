@@ -0,0 +1,179 @@
+"""In-memory index over SOC occupation codes and their O*NET job zones.
+
+data/soc_job_zones.tsv is read once, when this module is imported, into:
+
+- an exact code map, which also resolves SOC 2010 codes that were merged or
+  renumbered in SOC 2018;
+- a sorted code list, searched with bisect, for prefix and major-group
+  queries such as "15-11" or "15-0000";
+- a trigram inverted index over titles for fuzzy title search.
+
+Lookups are dict or bisect operations and title search only scores titles
+that share a trigram with the query, so checks stay well under a
+millisecond. check_soc_code() turns a lookup into the verdict shown by the
+SOC Code Checker in both apps. The bundled table covers a subset of the
+detailed occupations until it is regenerated from the full O*NET database
+with scripts/build_soc_data.py, so a well-formed code that is not in it is
+reported as unlisted, to be verified on O*NET, never as invalid.
+"""
+import os
+import re
+from bisect import bisect_left
+from collections import namedtuple
+from types import MappingProxyType
+
+SOC_DATA_PATH = os.getenv(
+    "SOC_DATA_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "soc_job_zones.tsv")
+)
+
+ONET_SEARCH_URL = "https://www.onetonline.org/find/result?s="
+
+# Job zones at or below this rarely support a specialty occupation
+SPECIALTY_MIN_JOB_ZONE = 4
+
+SocOccupation = namedtuple("SocOccupation", ["code", "title", "job_zone", "major_group"])
+
+_CODE_PATTERN = re.compile(r"^(\d{2})-?(\d{0,4})(?:\.\d{2})?$")
+
+
+def normalize_code(text):
+    """Normalise "151252", "15-1252.00" or "15-11" to SOC form, or return None"""
+    match = _CODE_PATTERN.match(text.strip())
+    if not match:
+        return None
+    major, detail = match.groups()
+    return f"{major}-{detail}" if detail else f"{major}-"
+
+
+def _trigrams(text):
+    padded = f"  {re.sub(r'[^a-z0-9]+', ' ', text.lower()).strip()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _load(path):
+    occupations = {}
+    aliases = {}
+    major_groups = {}
+    with open(path, encoding="utf-8") as f:
+        rows = [line.rstrip("\n").split("\t") for line in f if line.strip() and not line.startswith("#")]
+    for code, job_zone, title, formerly in rows[1:]:
+        if code.endswith("-0000"):
+            major_groups[code[:2]] = title
+            continue
+        occupations[code] = SocOccupation(code, title, int(job_zone) if job_zone else None, code[:2])
+        for old_code in filter(None, formerly.split(",")):
+            aliases[old_code.strip()] = code
+    return occupations, aliases, major_groups
+
+
+class SocIndex:
+    """Exact, prefix and fuzzy-title lookups over SOC occupations"""
+
+    def __init__(self, path=SOC_DATA_PATH):
+        occupations, aliases, major_groups = _load(path)
+        self.occupations = MappingProxyType(occupations)
+        self.aliases = MappingProxyType({old: new for old, new in aliases.items() if old not in occupations})
+        self.major_groups = MappingProxyType(major_groups)
+        self.codes = tuple(sorted(occupations))
+        postings = {}
+        self._title_grams = {}
+        for code, occupation in occupations.items():
+            grams = _trigrams(occupation.title)
+            self._title_grams[code] = grams
+            for gram in grams:
+                postings.setdefault(gram, []).append(code)
+        self._postings = MappingProxyType({gram: tuple(codes) for gram, codes in postings.items()})
+
+    def lookup(self, code):
+        """Return the occupation for an exact SOC 2018 or SOC 2010 code, or None"""
+        normalized = normalize_code(code)
+        if not normalized:
+            return None
+        return self.occupations.get(normalized) or self.occupations.get(self.aliases.get(normalized, ""))
+
+    def prefix(self, prefix, limit=50):
+        """Occupations whose code starts with a prefix such as "15-12"; "15-0000" means the whole major group"""
+        normalized = normalize_code(prefix)
+        if not normalized:
+            return []
+        if normalized.endswith("-0000"):
+            normalized = normalized[:3]
+        start = bisect_left(self.codes, normalized)
+        matches = []
+        for code in self.codes[start:]:
+            if not code.startswith(normalized) or len(matches) >= limit:
+                break
+            matches.append(self.occupations[code])
+        return matches
+
+    def major_group(self, code):
+        """Title of the major group a code belongs to"""
+        return self.major_groups.get(code.strip()[:2])
+
+    def search_titles(self, query, limit=10, min_score=0.2):
+        """Fuzzy title search, returning (occupation, score) pairs best first"""
+        grams = _trigrams(query)
+        if not grams:
+            return []
+        overlap = {}
+        for gram in grams:
+            for code in self._postings.get(gram, ()):
+                overlap[code] = overlap.get(code, 0) + 1
+        scored = []
+        for code, shared in overlap.items():
+            # Dice coefficient over trigram sets
+            score = 2 * shared / (len(grams) + len(self._title_grams[code]))
+            if score >= min_score:
+                scored.append((score, code))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [(self.occupations[code], round(score, 3)) for score, code in scored[:limit]]
+
+    def search(self, text, limit=10):
+        """Resolve free text as an exact code, a code prefix, or a title"""
+        occupation = self.lookup(text)
+        if occupation:
+            return [occupation]
+        if normalize_code(text):
+            return self.prefix(text, limit)
+        return [occupation for occupation, _ in self.search_titles(text, limit)]
+
+
+SOC_INDEX = SocIndex()
+
+
+def check_soc_code(soc_code):
+    """Check an SOC code's O*NET job zone (Job Zone 3 and below should be avoided)"""
+    occupation = SOC_INDEX.lookup(soc_code)
+    if occupation is None:
+        normalized = normalize_code(soc_code)
+        if normalized is None or len(normalized) != 7:
+            return {
+                "status": "NOT_FOUND",
+                "message": f"❓ {soc_code} is not a detailed SOC code.",
+                "recommendation": "Enter a code such as 15-1252, or search by position title.",
+            }
+        return {
+            "status": "NOT_FOUND",
+            "message": f"❓ SOC code {normalized} is not in the bundled subset of SOC occupations, so its job zone "
+                       "could not be checked here.",
+            "recommendation": f"Verify the code and its job zone on O*NET OnLine ({ONET_SEARCH_URL}{normalized}).",
+        }
+    renumbered = f" (SOC 2010 code {soc_code} is now {occupation.code})" if normalize_code(soc_code) != occupation.code else ""
+    group = SOC_INDEX.major_group(occupation.code)
+    if occupation.job_zone is not None and occupation.job_zone < SPECIALTY_MIN_JOB_ZONE:
+        return {
+            "status": "WARNING",
+            "message": (f"⚠️ This SOC code ({occupation.code}){renumbered} is Job Zone {occupation.job_zone} "
+                        "and should be avoided for H-1B specialty occupation."),
+            "title": occupation.title,
+            "group": group,
+            "recommendation": "Consider finding a more specific SOC code that falls in Job Zone 4 or 5.",
+        }
+    return {
+        "status": "OK",
+        "message": (f"✅ SOC code {occupation.code}{renumbered} is Job Zone {occupation.job_zone}, "
+                    "which is acceptable for H-1B specialty occupation."),
+        "title": occupation.title,
+        "group": group,
+        "recommendation": "Verify this SOC code aligns with the actual job duties and requirements.",
+    }
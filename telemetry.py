@@ -0,0 +1,378 @@
+"""Per-call telemetry for LLM requests.
+
+complete_chat() in llm_providers records one span for every target it
+tries. A span holds:
+
+- the feature, which is the task the call is routed as: a generate_*
+  handler or an app_agent analysis step;
+- tags set with call_tags(), such as the case type;
+- provider, model, outcome, HTTP status and latency;
+- prompt and completion tokens, and the estimated cost.
+
+Spans are appended to a sink under the cache directory, SQLite by default or
+JSONL (LLM_TELEMETRY_SINK). They also feed per-feature latency histograms and
+token and cost totals kept in memory. show_llm_usage() renders p50/p95
+latency and spend per feature from the sink, so the numbers cover every
+process that shares the cache directory.
+
+Streamed replies carry no usage block, so their token counts are estimated
+from the text. Spans are written by a background thread in batches, so
+callers never wait on the sink, and a sink error only increments a counter.
+"""
+import atexit
+import bisect
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+from sqlalchemy import Boolean, Column, Float, Integer, MetaData, String, Table, Text, create_engine, select
+
+from chunking import estimate_tokens
+from llm_cache import CACHE_DIR
+
+# sqlite, jsonl, or off to keep only the in-memory histograms
+TELEMETRY_SINK = os.getenv("LLM_TELEMETRY_SINK", "sqlite").lower()
+TELEMETRY_PATH = os.getenv("LLM_TELEMETRY_PATH") or os.path.join(
+    CACHE_DIR, "telemetry.jsonl" if TELEMETRY_SINK == "jsonl" else "telemetry.sqlite3")
+# The panel shows usage across every session, so operators opt in
+ADMIN_PANEL = os.getenv("LLM_ADMIN_PANEL", "false").lower() in ("1", "true", "yes")
+
+# Upper bounds of the latency histogram buckets in milliseconds: 10 ms to about 9 minutes, each 25% wider
+LATENCY_BUCKETS_MS = tuple(round(10 * 1.25 ** i) for i in range(50))
+
+# USD per million (prompt, completion) tokens; a model matches its longest prefix here
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4-32k": (60.00, 120.00),
+    "gpt-4": (30.00, 60.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+if os.getenv("LLM_MODEL_PRICES"):
+    MODEL_PRICES.update({model: tuple(prices) for model, prices in json.loads(os.environ["LLM_MODEL_PRICES"]).items()})
+
+OK, CACHE_HIT, ERROR = "ok", "cache_hit", "error"
+
+_tags = contextvars.ContextVar("llm_call_tags", default={})
+
+
+@contextmanager
+def call_tags(**tags):
+    """Attach tags such as case_type to the spans of the enclosed calls"""
+    token = _tags.set({**_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+def call_cost(provider, model, prompt_tokens, completion_tokens):
+    """Estimated USD cost of a call, or None for a model without a price"""
+    if provider == "ollama":
+        return 0.0
+    matches = [name for name in MODEL_PRICES if model.startswith(name)]
+    if not matches:
+        return None
+    prompt_price, completion_price = MODEL_PRICES[max(matches, key=len)]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def count_tokens(request, content, usage=None):
+    """(prompt_tokens, completion_tokens, estimated) from the API's usage block, or estimated from the text"""
+    if usage:
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0), False
+    prompt = "\n".join(message["content"] for message in request["messages"])
+    return estimate_tokens(prompt), estimate_tokens(content or ""), True
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with interpolated percentiles"""
+
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, fraction):
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.max
+                estimate = lower + (upper - lower) * (rank - seen) / count
+                return min(self.max, max(self.min, estimate))
+            seen += count
+        return self.max
+
+
+class FeatureStats:
+    """Aggregates of the spans for one feature (or other grouping)"""
+
+    def __init__(self):
+        self.calls = 0
+        self.cache_hits = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.latency = LatencyHistogram()
+
+    def add(self, span):
+        self.calls += 1
+        if span["outcome"] == CACHE_HIT:
+            self.cache_hits += 1
+            return
+        if span["outcome"] == ERROR:
+            self.errors += 1
+            return
+        # Percentiles cover answered API calls; cache hits and failures would skew them
+        self.latency.add(span["latency_ms"])
+        self.prompt_tokens += span["prompt_tokens"] or 0
+        self.completion_tokens += span["completion_tokens"] or 0
+        self.cost += span["cost_usd"] or 0.0
+
+    def row(self):
+        p50, p95 = self.latency.percentile(0.5), self.latency.percentile(0.95)
+        return {
+            "Calls": self.calls,
+            "Cache hits": self.cache_hits,
+            "Errors": self.errors,
+            "p50 ms": round(p50) if p50 is not None else None,
+            "p95 ms": round(p95) if p95 is not None else None,
+            "Prompt tokens": self.prompt_tokens,
+            "Completion tokens": self.completion_tokens,
+            "Cost USD": round(self.cost, 4),
+        }
+
+
+def summarize(spans, group_by=("feature",)):
+    """FeatureStats per group of spans, keyed by the span fields in group_by"""
+    groups = {}
+    for span in spans:
+        key = tuple(span.get(field) or span["tags"].get(field) or "-" for field in group_by)
+        groups.setdefault(key, FeatureStats()).add(span)
+    return groups
+
+
+class JsonlSink:
+    """Appends spans to a JSON Lines file"""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write_many(self, spans):
+        lines = [json.dumps(span, ensure_ascii=False) + "\n" for span in spans]
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+
+    def read(self, since=0.0):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                span = json.loads(line)
+                if span["ts"] >= since:
+                    yield span
+
+
+class SQLiteSink:
+    """Stores spans in a SQLite table, one row per call"""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.engine = create_engine(f"sqlite:///{path}")
+        metadata = MetaData()
+        self.table = Table(
+            "llm_calls", metadata,
+            Column("id", Integer, primary_key=True),
+            Column("ts", Float, nullable=False, index=True),
+            Column("feature", String(128), nullable=False),
+            Column("tags", Text, nullable=False),
+            Column("provider", String(32), nullable=False),
+            Column("model", String(128), nullable=False),
+            Column("outcome", String(16), nullable=False),
+            Column("status", Integer),
+            Column("error", Text),
+            Column("stream", Boolean, nullable=False),
+            Column("latency_ms", Float, nullable=False),
+            Column("prompt_tokens", Integer),
+            Column("completion_tokens", Integer),
+            Column("tokens_estimated", Boolean),
+            Column("cost_usd", Float),
+        )
+        metadata.create_all(self.engine)
+
+    def write_many(self, spans):
+        with self.engine.begin() as conn:
+            conn.execute(self.table.insert(), [dict(span, tags=json.dumps(span["tags"])) for span in spans])
+
+    def read(self, since=0.0):
+        table = self.table
+        with self.engine.connect() as conn:
+            rows = conn.execute(select(table).where(table.c.ts >= since).order_by(table.c.ts)).mappings().all()
+        for row in rows:
+            yield dict(row, tags=json.loads(row["tags"]))
+
+
+SINKS = {"sqlite": SQLiteSink, "jsonl": JsonlSink}
+
+
+class Telemetry:
+    """Records spans to a sink and keeps per-feature aggregates since start-up"""
+
+    def __init__(self, sink=None):
+        self.sink = sink
+        self.live = {}
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending = queue.SimpleQueue()
+        if sink is not None:
+            threading.Thread(target=self._writer, name="telemetry-writer", daemon=True).start()
+            atexit.register(self.flush)
+
+    def record(self, feature, provider, model, began, outcome, status=None, error=None, stream=False,
+               prompt_tokens=None, completion_tokens=None, tokens_estimated=None):
+        """Record one call that started at perf_counter() `began`"""
+        cost = None
+        if outcome == OK:
+            cost = call_cost(provider, model, prompt_tokens, completion_tokens)
+        span = {
+            "ts": time.time(),
+            "feature": feature,
+            "tags": _tags.get(),
+            "provider": provider,
+            "model": model,
+            "outcome": outcome,
+            "status": status,
+            "error": str(error)[:500] if error is not None else None,
+            "stream": stream,
+            "latency_ms": round((time.perf_counter() - began) * 1000, 1),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "tokens_estimated": tokens_estimated,
+            "cost_usd": cost,
+        }
+        with self._lock:
+            self.live.setdefault(feature, FeatureStats()).add(span)
+        if self.sink is not None:
+            self._pending.put(span)
+        return span
+
+    def _take_pending(self, block):
+        spans = [self._pending.get()] if block else []
+        while True:
+            try:
+                spans.append(self._pending.get_nowait())
+            except queue.Empty:
+                return spans
+
+    def _write(self, spans):
+        if not spans:
+            return
+        try:
+            self.sink.write_many(spans)
+        except Exception:
+            with self._lock:
+                self.dropped += len(spans)
+
+    def _writer(self):
+        while True:
+            spans = self._take_pending(block=True)
+            with self._write_lock:
+                self._write(spans)
+
+    def flush(self):
+        """Write the spans still queued for the sink"""
+        with self._write_lock:
+            self._write(self._take_pending(block=False))
+
+    def snapshot(self):
+        """Per-feature rows since this process started"""
+        with self._lock:
+            return {feature: stats.row() for feature, stats in self.live.items()}
+
+    def history(self, since=0.0, group_by=("feature",)):
+        """Aggregates of the spans in the sink since a timestamp"""
+        if self.sink is None:
+            return {}
+        self.flush()
+        return summarize(self.sink.read(since), group_by)
+
+
+@st.cache_resource(show_spinner=False)
+def get_telemetry():
+    """Process-wide telemetry recorder"""
+    sink_class = SINKS.get(TELEMETRY_SINK)
+    return Telemetry(sink_class(TELEMETRY_PATH) if sink_class else None)
+
+
+USAGE_WINDOWS = {
+    "Last hour": 3600,
+    "Last 24 hours": 24 * 3600,
+    "Last 7 days": 7 * 24 * 3600,
+    "Last 30 days": 30 * 24 * 3600,
+}
+USAGE_GROUPINGS = {
+    "Feature": ("feature",),
+    "Feature and case type": ("feature", "case_type"),
+    "Model": ("provider", "model"),
+}
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def usage_table(window_seconds, grouping):
+    """Usage per group over a time window as a DataFrame, most expensive first"""
+    telemetry = get_telemetry()
+    if telemetry.sink is None:
+        rows = [dict(Feature=feature, **row) for feature, row in telemetry.snapshot().items()]
+    else:
+        group_by = USAGE_GROUPINGS[grouping]
+        groups = telemetry.history(time.time() - window_seconds, group_by)
+        rows = [dict(zip((field.replace("_", " ").title() for field in group_by), key), **stats.row())
+                for key, stats in groups.items()]
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values("Cost USD", ascending=False, ignore_index=True)
+
+
+def show_llm_usage():
+    """Admin panel: latency percentiles and token spend per feature"""
+    if not ADMIN_PANEL:
+        return
+    with st.expander("📊 LLM usage (admin)"):
+        window = st.selectbox("Window", list(USAGE_WINDOWS), index=1, key="llm_usage_window")
+        grouping = st.selectbox("Group by", list(USAGE_GROUPINGS), key="llm_usage_grouping")
+        if st.button("Refresh", key="llm_usage_refresh"):
+            usage_table.clear()
+        table = usage_table(USAGE_WINDOWS[window], grouping)
+        if table.empty:
+            st.caption("No LLM calls recorded in this window.")
+            return
+        st.caption(f"💵 ${table['Cost USD'].sum():.2f} · {int(table['Prompt tokens'].sum() + table['Completion tokens'].sum()):,} "
+                   f"tokens · {int(table['Calls'].sum()):,} calls · p50/p95 exclude cache hits and errors")
+        st.dataframe(table, hide_index=True, use_container_width=True)
+        if get_telemetry().sink is None:
+            st.caption("Telemetry sink is off; showing this process since start-up.")
@@ -0,0 +1,250 @@
+"""US visa categories and a precomputed lookup index.
+
+US_VISA_CATEGORIES is the source table, nested as
+category -> subcategory -> {visa code: visa name}. Everything the UI needs
+from it - the flat selectbox options, code/label lookups and per-category
+code lists - is derived once when this module is first imported, instead of
+re-flattening the table on every Streamlit rerun. The derived structures are
+read-only.
+"""
+from collections import namedtuple
+from types import MappingProxyType
+
+GENERAL_MATTER = "General Immigration Matter"
+
+VisaType = namedtuple("VisaType", ["code", "name", "category", "subcategory", "label"])
+
+# Comprehensive US Visa Categories and Immigration Types
+US_VISA_CATEGORIES = {
+    "Non-Immigrant Visas": {
+        "Business/Work": {
+            "H-1B": "Specialty Occupation Workers",
+            "H-1B1": "Free Trade Agreement Professionals (Chile/Singapore)",
+            "H-2A": "Temporary Agricultural Workers",
+            "H-2B": "Temporary Non-Agricultural Workers",
+            "H-3": "Trainees and Special Education Exchange Visitors",
+            "H-4": "Dependents of H Visa Holders",
+            "L-1A": "Intracompany Transferee Executives/Managers",
+            "L-1B": "Intracompany Transferee Specialized Knowledge",
+            "L-2": "Dependents of L-1 Visa Holders",
+            "O-1A": "Extraordinary Ability in Sciences/Education/Business/Athletics",
+            "O-1B": "Extraordinary Ability in Arts/Motion Pictures/TV",
+            "O-2": "Support Personnel for O-1",
+            "O-3": "Dependents of O-1/O-2 Visa Holders",
+            "P-1A": "Internationally Recognized Athletes",
+            "P-1B": "Members of Internationally Recognized Entertainment Groups",
+            "P-2": "Artists/Entertainers in Reciprocal Exchange Programs",
+            "P-3": "Artists/Entertainers in Culturally Unique Programs",
+            "P-4": "Dependents of P Visa Holders",
+            "E-1": "Treaty Traders",
+            "E-2": "Treaty Investors",
+            "E-3": "Australian Professionals",
+            "TN": "NAFTA/USMCA Professionals",
+            "R-1": "Religious Workers",
+            "R-2": "Dependents of R-1 Visa Holders"
+        },
+        "Students/Exchange": {
+            "F-1": "Academic Students",
+            "F-2": "Dependents of F-1 Students",
+            "M-1": "Vocational Students",
+            "M-2": "Dependents of M-1 Students",
+            "J-1": "Exchange Visitors",
+            "J-2": "Dependents of J-1 Exchange Visitors"
+        },
+        "Visitors": {
+            "B-1": "Business Visitors",
+            "B-2": "Tourism/Pleasure Visitors",
+            "B-1/B-2": "Combined Business/Tourism"
+        },
+        "Transit/Crew": {
+            "C-1": "Transit Aliens",
+            "C-2": "Transit to UN Headquarters",
+            "C-3": "Government Officials in Transit",
+            "D-1": "Crew Members (Sea/Air)",
+            "D-2": "Crew Members (Continuing Service)"
+        },
+        "Media": {
+            "I": "Representatives of Foreign Media"
+        },
+        "Diplomatic": {
+            "A-1": "Ambassadors/Government Officials",
+            "A-2": "Government Officials/Employees",
+            "A-3": "Personal Employees of A-1/A-2",
+            "G-1": "Representatives to International Organizations",
+            "G-2": "Representatives to International Organizations",
+            "G-3": "Representatives to International Organizations",
+            "G-4": "International Organization Officers/Employees",
+            "G-5": "Personal Employees of G-1 through G-4"
+        },
+        "Other": {
+            "K-1": "Fiancé(e) of US Citizen",
+            "K-2": "Children of K-1",
+            "K-3": "Spouse of US Citizen",
+            "K-4": "Children of K-3",
+            "Q-1": "International Cultural Exchange",
+            "Q-2": "Irish Peace Process Cultural/Training Program",
+            "Q-3": "Dependents of Q-2",
+            "S-5": "Informants on Criminal Organizations",
+            "S-6": "Informants on Terrorism",
+            "S-7": "Dependents of S-5/S-6",
+            "T-1": "Victims of Human Trafficking",
+            "T-2": "Spouse of T-1",
+            "T-3": "Child of T-1",
+            "T-4": "Parent of T-1",
+            "U-1": "Victims of Criminal Activity",
+            "U-2": "Spouse of U-1",
+            "U-3": "Child of U-1",
+            "U-4": "Parent of U-1",
+            "V-1": "Spouse of LPR",
+            "V-2": "Child of LPR",
+            "V-3": "Derivative Child of V-1/V-2"
+        }
+    },
+    "Green Card/Permanent Residence": {
+        "Employment-Based Green Cards": {
+            "EB-1A": "Extraordinary Ability",
+            "EB-1B": "Outstanding Professors and Researchers",
+            "EB-1C": "Multinational Managers and Executives",
+            "EB-2": "Advanced Degree Professionals",
+            "EB-2 NIW": "National Interest Waiver",
+            "EB-3": "Skilled Workers and Professionals",
+            "EB-3 Other": "Other Workers (Unskilled)",
+            "EB-4": "Special Immigrants (Religious Workers, etc.)",
+            "EB-5": "Immigrant Investors"
+        },
+        "Family-Based Green Cards": {
+            "IR-1": "Spouse of US Citizen",
+            "IR-2": "Unmarried Child (Under 21) of US Citizen",
+            "IR-3": "Orphan Adopted Abroad by US Citizen",
+            "IR-4": "Orphan to be Adopted by US Citizen",
+            "IR-5": "Parent of US Citizen (21 or older)",
+            "F1": "Unmarried Sons/Daughters of US Citizens",
+            "F2A": "Spouses/Unmarried Children (Under 21) of LPRs",
+            "F2B": "Unmarried Sons/Daughters (21+) of LPRs",
+            "F3": "Married Sons/Daughters of US Citizens",
+            "F4": "Siblings of US Citizens"
+        },
+        "Other Green Card Categories": {
+            "Diversity Visa": "DV Lottery Winners",
+            "Asylum-Based": "Asylum Adjustment of Status",
+            "Refugee-Based": "Refugee Adjustment of Status",
+            "VAWA": "Violence Against Women Act",
+            "Registry": "Registry (Pre-1972 Entry)",
+            "Cuban Adjustment": "Cuban Adjustment Act",
+            "Nicaraguan/Central American": "NACARA",
+            "Special Immigrant Juvenile": "SIJ Status"
+        },
+        "Green Card Processes": {
+            "I-485": "Adjustment of Status",
+            "Consular Processing": "Immigrant Visa Processing Abroad",
+            "I-601": "Inadmissibility Waiver",
+            "I-601A": "Provisional Unlawful Presence Waiver",
+            "I-751": "Removal of Conditions on Residence",
+            "I-90": "Green Card Renewal/Replacement"
+        }
+    },
+    "Immigrant Visas": {
+        "Family-Based": {
+            "IR-1": "Spouse of US Citizen",
+            "IR-2": "Unmarried Child (Under 21) of US Citizen",
+            "IR-3": "Orphan Adopted Abroad by US Citizen",
+            "IR-4": "Orphan to be Adopted by US Citizen",
+            "IR-5": "Parent of US Citizen (21 or older)",
+            "F1": "Unmarried Sons/Daughters of US Citizens",
+            "F2A": "Spouses/Unmarried Children (Under 21) of LPRs",
+            "F2B": "Unmarried Sons/Daughters (21+) of LPRs",
+            "F3": "Married Sons/Daughters of US Citizens",
+            "F4": "Siblings of US Citizens"
+        },
+        "Employment-Based": {
+            "EB-1A": "Extraordinary Ability",
+            "EB-1B": "Outstanding Professors/Researchers",
+            "EB-1C": "Multinational Managers/Executives",
+            "EB-2": "Advanced Degree Professionals",
+            "EB-2 NIW": "National Interest Waiver",
+            "EB-3": "Skilled Workers/Professionals",
+            "EB-3 Other": "Other Workers",
+            "EB-4": "Special Immigrants",
+            "EB-5": "Immigrant Investors"
+        },
+        "Diversity": {
+            "DV": "Diversity Visa Lottery"
+        },
+        "Special Categories": {
+            "Asylum": "Asylum-Based Adjustment",
+            "Refugee": "Refugee-Based Adjustment",
+            "VAWA": "Violence Against Women Act",
+            "Registry": "Registry (Pre-1972 Entry)"
+        }
+    },
+    "Other Immigration Matters": {
+        "Status Changes": {
+            "AOS": "Adjustment of Status",
+            "COS": "Change of Status",
+            "Extension": "Extension of Stay"
+        },
+        "Naturalization": {
+            "N-400": "Application for Naturalization",
+            "N-600": "Certificate of Citizenship",
+            "N-565": "Replacement of Citizenship Document"
+        },
+        "Protection": {
+            "Asylum": "Asylum Applications",
+            "Withholding": "Withholding of Removal",
+            "CAT": "Convention Against Torture",
+            "TPS": "Temporary Protected Status",
+            "DED": "Deferred Enforced Departure"
+        },
+        "Removal Defense": {
+            "Cancellation": "Cancellation of Removal",
+            "Relief": "Other Forms of Relief",
+            "Appeals": "BIA Appeals",
+            "Motions": "Motions to Reopen/Reconsider"
+        },
+        "Special Programs": {
+            "DACA": "Deferred Action for Childhood Arrivals",
+            "Parole": "Humanitarian Parole",
+            "Waiver": "Inadmissibility Waivers"
+        }
+    }
+}
+
+
+def _build_index(categories):
+    entries = []
+    for category, subcategories in categories.items():
+        for subcategory, visas in subcategories.items():
+            for code, name in visas.items():
+                entries.append(VisaType(code, name, category, subcategory, f"{code} - {name}"))
+    return tuple(entries)
+
+
+# Every (code, subcategory) occurrence; some codes appear under more than one heading
+VISA_ENTRIES = _build_index(US_VISA_CATEGORIES)
+
+# Code -> first listed VisaType
+VISA_BY_CODE = MappingProxyType({entry.code: entry for entry in reversed(VISA_ENTRIES)})
+
+# Selectbox label ("H-1B - Specialty Occupation Workers") -> VisaType
+VISA_BY_LABEL = MappingProxyType({entry.label: entry for entry in reversed(VISA_ENTRIES)})
+
+# (category, subcategory) -> codes, in table order
+VISA_CODES_BY_SUBCATEGORY = MappingProxyType({
+    (category, subcategory): tuple(visas)
+    for category, subcategories in US_VISA_CATEGORIES.items()
+    for subcategory, visas in subcategories.items()
+})
+
+# Ready-made options for the visa selectboxes
+VISA_SELECT_OPTIONS = (GENERAL_MATTER,) + tuple(sorted(VISA_BY_LABEL))
+
+
+def visa_code_from_label(label):
+    """Return the visa code for a selectbox label, or the label itself if it isn't one"""
+    entry = VISA_BY_LABEL.get(label)
+    return entry.code if entry else label
+
+
+def lookup_visa(code):
+    """Return the VisaType for a visa code, or None"""
+    return VISA_BY_CODE.get(code)